@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CrawlTask, CrawlLog
+from .models import CrawlTask, CrawlLog, CrawlWatermark
 
 
 @admin.register(CrawlTask)
@@ -15,4 +15,12 @@ class CrawlLogAdmin(admin.ModelAdmin):
     list_display = ['task', 'level', 'message', 'created_at']
     list_filter = ['level', 'created_at']
     search_fields = ['message']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+
+@admin.register(CrawlWatermark)
+class CrawlWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['platform', 'task_type', 'target', 'pages_crawled', 'new_items', 'last_crawled_at']
+    list_filter = ['platform', 'task_type']
+    search_fields = ['target']
+    readonly_fields = ['last_crawled_at']
\ No newline at end of file
@@ -0,0 +1,52 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from crawler.models import CrawlTask
+
+
+def cancel_cache_key(task_id):
+    return f'crawler:task:{task_id}:cancelled'
+
+
+def request_cancel(task_id):
+    """设置任务的取消标记，运行中的爬虫会在下一次检查时停止"""
+    cache.set(cancel_cache_key(task_id), True, settings.CRAWLER_PROGRESS_CACHE_TIMEOUT)
+
+
+class CancellationToken:
+    """爬虫使用的取消令牌
+
+    优先读取缓存中的取消标记；标记不存在时(如直接在后台修改了状态)
+    最多每 db_interval 秒查询一次数据库。两次检查间隔小于 check_interval
+    时直接返回上次结果，可以放心地在每条数据之间调用。
+    """
+
+    def __init__(self, task_id, check_interval, db_interval):
+        self.task_id = task_id
+        self.check_interval = check_interval
+        self.db_interval = db_interval
+        self._cancelled = False
+        self._last_check = 0
+        self._last_db_check = time.monotonic()
+        self._lock = threading.Lock()
+
+    def is_cancelled(self):
+        """任务是否已被取消"""
+        with self._lock:
+            if self._cancelled:
+                return True
+
+            now = time.monotonic()
+            if now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+
+            if cache.get(cancel_cache_key(self.task_id)):
+                self._cancelled = True
+            elif now - self._last_db_check >= self.db_interval:
+                self._last_db_check = now
+                self._cancelled = CrawlTask.objects.filter(
+                    id=self.task_id, status='cancelled'
+                ).exists()
+            return self._cancelled
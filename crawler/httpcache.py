@@ -0,0 +1,164 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+from django.conf import settings
+
+
+def normalize_request(method, url, params=None):
+    """规范化请求: 合并URL自带参数与params并排序，保证相同请求得到相同的键"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((str(name), str(value)) for name, value in params.items())
+    query.sort()
+    return f'{method.upper()} ' + urlunsplit(
+        (parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), '')
+    )
+
+
+class CachedResponse:
+    """缓存中的一条响应"""
+
+    def __init__(self, url, status_code, headers, body, etag, last_modified, stored_at):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    def is_fresh(self, ttl):
+        """是否仍在有效期内"""
+        return time.time() - self.stored_at < ttl
+
+    def conditional_headers(self):
+        """重新验证时使用的条件请求头"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        """还原为 requests.Response"""
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.url = self.url
+        response.encoding = response.apparent_encoding
+        return response
+
+
+class ResponseCache:
+    """基于SQLite文件的HTTP响应缓存
+
+    响应体经zlib压缩后存储，总大小超过 max_bytes 时按最近访问时间淘汰。
+    SQLite自带文件锁，同一台机器上的多个Worker进程可以共用一个缓存文件。
+    """
+
+    # 每写入多少条检查一次总大小
+    evict_every = 50
+
+    def __init__(self, path, max_bytes):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB,'
+                ' etag TEXT, last_modified TEXT, stored_at REAL, accessed_at REAL, size INTEGER)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)'
+            )
+
+    @staticmethod
+    def make_key(method, url, params=None):
+        """生成缓存键"""
+        return hashlib.sha1(normalize_request(method, url, params).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """读取缓存，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, status, headers, body, etag, last_modified, stored_at'
+                ' FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute(
+                    'UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key)
+                )
+        url, status, headers, body, etag, last_modified, stored_at = row
+        return CachedResponse(url, status, json.loads(headers), zlib.decompress(body),
+                              etag, last_modified, stored_at)
+
+    def set(self, key, response):
+        """写入一条成功的响应"""
+        body = zlib.compress(response.content)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, response.url, response.status_code, json.dumps(dict(response.headers)),
+                     body, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                     now, now, len(body))
+                )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict()
+
+    def touch(self, key):
+        """重新验证通过(304)后刷新存储时间"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?', (now, now, key)
+            )
+
+    def _evict(self):
+        """总大小超出上限时删除最久未访问的条目"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        keys = []
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self._conn:
+            self._conn.executemany('DELETE FROM responses WHERE key = ?', keys)
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """获取进程内共用的响应缓存"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                settings.CRAWLER_HTTP_CACHE_PATH,
+                settings.CRAWLER_HTTP_CACHE_MAX_BYTES
+            )
+        return _response_cache
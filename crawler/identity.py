@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+
+class IdentityMap:
+    """(模型, 平台, 平台ID) -> 主键 的有界LRU映射
+
+    每个条目同时记录上次写入时抓取字段的指纹，指纹一致说明数据未变化，
+    可以跳过数据库查询和写入。parent 为可选的上级映射(进程级共享LRU)，
+    本地未命中时会再查上级。
+    """
+
+    def __init__(self, maxsize, parent=None):
+        self.maxsize = maxsize
+        self.parent = parent
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, platform, platform_id):
+        """生成映射键"""
+        return (model._meta.label, platform.pk, str(platform_id))
+
+    @staticmethod
+    def fingerprint(data):
+        """计算抓取字段的指纹"""
+        return hash(tuple(sorted((name, str(value)) for name, value in data.items())))
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+        if entry is None and self.parent is not None:
+            entry = self.parent._get(key)
+            if entry is not None:
+                self._set(key, entry)
+        return entry
+
+    def _set(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def lookup(self, key, data):
+        """查询主键，仅当已知且抓取字段未变化时返回主键，否则返回None"""
+        entry = self._get(key)
+        if entry is not None and entry[1] == self.fingerprint(data):
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def put(self, key, pk, data):
+        """记录主键和抓取字段指纹"""
+        entry = (pk, self.fingerprint(data))
+        self._set(key, entry)
+        if self.parent is not None:
+            self.parent._set(key, entry)
+
+    def clear(self):
+        """清空映射(包括上级映射)，在写入失败、主键可能失效时调用"""
+        with self._lock:
+            self._data.clear()
+        if self.parent is not None:
+            self.parent.clear()
+
+    def stats(self):
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0,
+        }
+
+
+_worker_identity_map = None
+_worker_identity_map_lock = threading.Lock()
+
+
+def get_identity_map():
+    """为单个爬虫实例创建映射，按配置挂接进程级共享LRU"""
+    global _worker_identity_map
+
+    parent = None
+    if settings.CRAWLER_SHARED_IDENTITY_MAP:
+        with _worker_identity_map_lock:
+            if _worker_identity_map is None:
+                _worker_identity_map = IdentityMap(settings.CRAWLER_SHARED_IDENTITY_MAP_SIZE)
+            parent = _worker_identity_map
+
+    return IdentityMap(settings.CRAWLER_IDENTITY_MAP_SIZE, parent=parent)
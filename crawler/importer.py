@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import logging
+from django.conf import settings
+from django.db import connections, transaction
+from music.models import Song, Platform
+from music.search import index_songs
+from music.leaderboard import record_songs
+from music.responsecache import invalidate_platforms
+from music.dedup import safe_assign_works
+from crawler.identity import IdentityMap
+from crawler.writer import CatalogWriter
+
+logger = logging.getLogger('crawler')
+
+
+def shard_ranges(path, shards, offset=0):
+    """把文件 [offset, 文件末尾) 按字节均分为若干区间
+
+    区间边界不必落在行首，import_shard 会对齐到下一行开头，
+    每行只由起始位置所在的区间处理。
+    """
+    size = os.path.getsize(path)
+    shards = max(1, min(shards, size - offset)) if size > offset else 1
+    step = (size - offset) // shards
+    bounds = [offset + step * i for i in range(shards)] + [size]
+    return [(bounds[i], bounds[i + 1]) for i in range(shards)]
+
+
+def read_lines(path, start, end):
+    """读取起始位置在 [start, end) 内的行，返回 (行, 行结束位置) 迭代器"""
+    with open(path, 'rb') as f:
+        position = start
+        if start > 0:
+            # 从前一个字节开始读到换行，恰好跳过被区间边界截断的行
+            f.seek(start - 1)
+            position = start - 1 + len(f.readline())
+        else:
+            f.seek(0)
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line, position
+
+
+class ShardImporter:
+    """导入文件的一个字节区间
+
+    每 batch_size 行在一个事务中按平台批量upsert，事务提交后记录已提交偏移，
+    中断后可从该偏移续传(upsert幂等，重复导入不会产生重复数据)。
+    """
+
+    def __init__(self, path, start, end, default_platform=None, batch_size=5000,
+                 update_index=True, report_interval=10, label=''):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.default_platform = default_platform
+        self.batch_size = batch_size
+        self.update_index = update_index
+        self.report_interval = report_interval
+        self.label = label
+        self.committed = start
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+        self.identity_map = IdentityMap(settings.CRAWLER_IDENTITY_MAP_SIZE)
+        self._platforms = {}
+        self._started_at = None
+        self._reported_at = None
+
+    def get_platform(self, name):
+        """按名称获取平台，结果缓存在本地"""
+        if name not in self._platforms:
+            self._platforms[name] = Platform.objects.filter(name=name).first()
+        return self._platforms[name]
+
+    def run(self):
+        """执行导入，返回统计信息；出错时 error 字段为错误信息，committed 为可续传的偏移"""
+        self._started_at = self._reported_at = time.monotonic()
+        error = None
+        batch = []
+        try:
+            for line, position in read_lines(self.path, self.start, self.end):
+                batch.append(line)
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch, position)
+                    batch = []
+            if batch:
+                self.import_batch(batch, self.end)
+            self.committed = self.end
+        except Exception as e:
+            error = str(e)
+            logger.error(f'{self.label}导入失败，可从偏移 {self.committed} 续传: {error}')
+
+        elapsed = time.monotonic() - self._started_at
+        return dict(self.stats, start=self.start, end=self.end, committed=self.committed,
+                    elapsed=elapsed, error=error)
+
+    def import_batch(self, lines, position):
+        """解析并在一个事务中写入一批行，position 为最后一行的结束偏移"""
+        items_by_platform = {}
+        failed = 0
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                failed += 1
+                continue
+            if not CatalogWriter.is_valid_item(item):
+                failed += 1
+                continue
+            platform_name = item.get('platform') or self.default_platform
+            platform = self.get_platform(platform_name) if isinstance(platform_name, str) else None
+            if platform is None:
+                failed += 1
+                continue
+            items_by_platform.setdefault(platform, []).append(item)
+
+        song_ids = []
+        created = updated = unchanged = 0
+        changed_platforms = []
+        try:
+            with transaction.atomic():
+                for platform, items in items_by_platform.items():
+                    writer = CatalogWriter(platform, self.identity_map)
+                    batch_created, batch_updated, batch_unchanged, batch_song_ids = writer.write(items)
+                    created += batch_created
+                    updated += batch_updated
+                    unchanged += batch_unchanged
+                    song_ids.extend(batch_song_ids)
+                    if batch_song_ids:
+                        changed_platforms.append(platform.pk)
+        except Exception:
+            # 事务已回滚，映射中记录的主键可能失效
+            self.identity_map.clear()
+            raise
+
+        self.committed = position
+        self.stats['rows'] += len(lines)
+        self.stats['created'] += created
+        self.stats['updated'] += updated
+        self.stats['unchanged'] += unchanged
+        self.stats['failed'] += failed
+
+        if changed_platforms:
+            invalidate_platforms(changed_platforms)
+        if self.update_index and song_ids:
+            index_songs(Song.objects.filter(pk__in=song_ids))
+            record_songs(Song.objects.filter(pk__in=song_ids))
+            safe_assign_works(song_ids)
+
+        now = time.monotonic()
+        if now - self._reported_at >= self.report_interval:
+            self._reported_at = now
+            rate = self.stats['rows'] / (now - self._started_at)
+            logger.info(f'{self.label}已导入{self.stats["rows"]}行，{rate:.0f}行/秒，'
+                        f'已提交偏移 {self.committed}')
+
+
+def import_shard(path, start, end, options):
+    """在子进程中导入一个区间"""
+    # 子进程不能复用父进程的数据库连接
+    connections.close_all()
+    try:
+        return ShardImporter(path, start, end, **options).run()
+    finally:
+        connections.close_all()
@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+from django.utils import timezone
+from crawler.models import CrawlLog
+
+logger = logging.getLogger('crawler')
+
+
+class CrawlLogBuffer:
+    """缓冲写入的爬虫日志
+
+    只保留级别不低于 level 的日志，攒够 buffer_size 条或距上次写入超过
+    flush_interval 秒时用 bulk_create 一次写入，任务结束或失败时需调用 flush。
+    """
+
+    def __init__(self, task, level='INFO', buffer_size=100, flush_interval=5):
+        self.task = task
+        self.level = logging.getLevelName(level.upper())
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def is_enabled_for(self, level):
+        """判断该级别的日志是否需要持久化"""
+        return logging.getLevelName(level.upper()) >= self.level
+
+    def write(self, level, message):
+        """写入一条日志"""
+        if not self.is_enabled_for(level):
+            return
+
+        with self._lock:
+            self._buffer.append(CrawlLog(
+                task=self.task,
+                level=level,
+                message=message,
+                created_at=timezone.now()
+            ))
+            should_flush = (
+                len(self._buffer) >= self.buffer_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """将缓冲中的日志写入数据库"""
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+
+        if not entries:
+            return
+
+        try:
+            CrawlLog.objects.bulk_create(entries, batch_size=self.buffer_size)
+        except Exception as e:
+            logger.error(f'Task {self.task.id}: 写入{len(entries)}条爬虫日志失败: {str(e)}')
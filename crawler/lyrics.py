@@ -0,0 +1,70 @@
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from music.models import Song
+from music.search import index_songs
+from music.responsecache import invalidate_platforms
+
+# LRC 时间标签，如 [01:23.45]
+LRC_TIME_RE = re.compile(r'\[\d+:\d+(?:[.:]\d+)?\]')
+# LRC 元信息行，如 [ar:歌手]、[offset:0]
+LRC_META_RE = re.compile(r'^\[[a-z]+:[^\]]*\]$', re.IGNORECASE)
+
+
+def strip_lrc(text):
+    """去掉LRC歌词的时间标签和元信息，只保留歌词文本"""
+    lines = []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if LRC_META_RE.match(line):
+            continue
+        line = LRC_TIME_RE.sub('', line).strip()
+        if line:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def lyrics_candidates(platform, after=0, limit=200):
+    """按主键顺序取出待补全歌词的歌曲，返回 [(主键, 平台ID)]
+
+    待补全: 从未获取过且没有歌词，或上次获取早于 CRAWLER_LYRICS_TTL_DAYS 天。
+    获取过但平台没有歌词(如纯音乐)的歌曲在过期前不再重复请求。
+    """
+    stale_before = timezone.now() - timedelta(days=settings.CRAWLER_LYRICS_TTL_DAYS)
+    queryset = Song.objects.filter(platform=platform, pk__gt=after).filter(
+        Q(lyrics_updated_at__isnull=True, lyrics='') | Q(lyrics_updated_at__lt=stale_before)
+    )
+    return list(queryset.order_by('pk').values_list('pk', 'platform_id')[:limit])
+
+
+def save_lyrics(platform, lyrics_by_pk, batch_size=500):
+    """批量写入一批歌词，返回 (有变化的歌曲数, 未变化的歌曲数)
+
+    lyrics_by_pk 为 {歌曲主键: 歌词}。所有歌曲都记录获取时间；只有歌词变化的
+    歌曲才更新 lyrics 和 updated_at，并重建全文索引。重复执行结果相同。
+    """
+    if not lyrics_by_pk:
+        return 0, 0
+    now = timezone.now()
+    stored = dict(Song.objects.filter(pk__in=list(lyrics_by_pk)).values_list('pk', 'lyrics'))
+    changed = [
+        Song(pk=pk, lyrics=lyrics, lyrics_updated_at=now, updated_at=now)
+        for pk, lyrics in lyrics_by_pk.items()
+        if pk in stored and stored[pk] != lyrics
+    ]
+    unchanged = [pk for pk, lyrics in lyrics_by_pk.items() if pk in stored and stored[pk] == lyrics]
+
+    with transaction.atomic():
+        Song.objects.bulk_update(changed, ['lyrics', 'lyrics_updated_at', 'updated_at'],
+                                 batch_size=batch_size)
+        if unchanged:
+            Song.objects.filter(pk__in=unchanged).update(lyrics_updated_at=now)
+
+    if changed:
+        # 批量写入不触发信号，需要手动更新全文索引并使接口缓存失效
+        index_songs(Song.objects.filter(pk__in=[song.pk for song in changed]))
+        invalidate_platforms([platform.pk])
+    return len(changed), len(unchanged)
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from crawler.models import CrawlTask
-from crawler.tasks import start_crawl_task
+from crawler.tasks import submit_crawl_task
 from music.models import Platform
 
 
@@ -15,7 +15,14 @@ class Command(BaseCommand):
         parser.add_argument('--keyword', type=str, help='搜索关键词（搜索类型必需）')
         parser.add_argument('--url', type=str, help='目标URL（非搜索类型必需）')
         parser.add_argument('--pages', type=int, default=1, help='最大爬取页数')
-        parser.add_argument('--delay', type=int, default=1, help='请求延迟秒数')
+        parser.add_argument('--delay', type=int, default=0, help='请求延迟秒数，0表示只按平台限流')
+        parser.add_argument('--concurrency', type=int, default=1, help='并发请求数')
+        parser.add_argument('--use-cache', action='store_true', help='使用HTTP响应缓存')
+        parser.add_argument('--incremental', action='store_true',
+                          help='增量爬取: 跳过未变化的歌曲，没有新数据时停止翻页')
+        parser.add_argument('--log-level', type=str, default='INFO',
+                          choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+                          help='写入数据库的最低日志级别')
 
     def handle(self, *args, **options):
         try:
@@ -50,7 +57,11 @@ class Command(BaseCommand):
             target_url=options.get('url', ''),
             search_keyword=options.get('keyword', ''),
             max_pages=options['pages'],
-            delay_seconds=options['delay']
+            delay_seconds=options['delay'],
+            concurrency=options['concurrency'],
+            use_http_cache=options['use_cache'],
+            incremental=options['incremental'],
+            log_level=options['log_level']
         )
 
         self.stdout.write(
@@ -58,7 +69,7 @@ class Command(BaseCommand):
         )
 
         # 启动任务
-        start_crawl_task.delay(task.id)
+        submit_crawl_task(task)
         self.stdout.write(
             self.style.SUCCESS('任务已提交到队列，正在后台执行...')
         )
\ No newline at end of file
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from crawler.models import CrawlTask
+from crawler.tasks import submit_crawl_task
+from music.models import Platform
+
+
+class Command(BaseCommand):
+    help = '创建歌词补全任务，分批获取缺少或过期歌词的歌曲'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--platform', type=str, required=True, help='音乐平台名称')
+        parser.add_argument('--batches', type=int, default=100,
+                          help=f'最多处理的批数，每批 CRAWLER_LYRICS_BATCH_SIZE({settings.CRAWLER_LYRICS_BATCH_SIZE})首')
+        parser.add_argument('--delay', type=int, default=0, help='请求延迟秒数，0表示只按平台限流')
+        parser.add_argument('--concurrency', type=int, default=4, help='并发请求数')
+        parser.add_argument('--log-level', type=str, default='INFO',
+                          choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+                          help='写入数据库的最低日志级别')
+
+    def handle(self, *args, **options):
+        try:
+            platform = Platform.objects.get(name=options['platform'])
+        except Platform.DoesNotExist:
+            self.stdout.write(
+                self.style.ERROR(f'平台 "{options["platform"]}" 不存在')
+            )
+            return
+
+        task = CrawlTask.objects.create(
+            name=f'lyrics-{platform.name}',
+            platform=platform,
+            task_type='lyrics',
+            target_url=platform.base_url,
+            max_pages=options['batches'],
+            delay_seconds=options['delay'],
+            concurrency=options['concurrency'],
+            log_level=options['log_level']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'已创建歌词补全任务: {task.name} (ID: {task.id})')
+        )
+
+        submit_crawl_task(task)
+        self.stdout.write(
+            self.style.SUCCESS(f'任务已提交到队列 {settings.CRAWLER_LYRICS_QUEUE}，正在后台执行...')
+        )
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from music.models import Platform
+from crawler.importer import ShardImporter, shard_ranges, import_shard
+
+
+class Command(BaseCommand):
+    help = '从JSONL文件批量导入爬取结果(每行一个 {"platform", "artist", "album", "song"} 条目)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='JSONL文件路径')
+        parser.add_argument('--platform', type=str,
+                          help='默认平台名称（条目中未提供 platform 时使用）')
+        parser.add_argument('--workers', type=int, default=1, help='并行进程数，文件按字节区间分片')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每个事务写入的行数')
+        parser.add_argument('--offset', type=int, default=0, help='从该字节偏移开始导入（续传）')
+        parser.add_argument('--skip-index', action='store_true',
+                          help='不更新全文索引和热门榜单（导入后再执行 rebuild_search_index 和 rebuild_leaderboard）')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'文件 "{path}" 不存在')
+        if options['platform'] and not Platform.objects.filter(name=options['platform']).exists():
+            raise CommandError(f'平台 "{options["platform"]}" 不存在')
+
+        shard_options = {
+            'default_platform': options['platform'],
+            'batch_size': options['batch_size'],
+            'update_index': not options['skip_index'],
+        }
+        ranges = shard_ranges(path, options['workers'], options['offset'])
+
+        started_at = time.monotonic()
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            results = [ShardImporter(path, start, end, **shard_options).run()]
+        else:
+            # 子进程各自建立数据库连接
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [
+                    executor.submit(import_shard, path, start, end,
+                                    dict(shard_options, label=f'[分片{index}] '))
+                    for index, (start, end) in enumerate(ranges, 1)
+                ]
+                results = [future.result() for future in futures]
+        elapsed = time.monotonic() - started_at
+
+        for index, result in enumerate(results, 1):
+            rate = result['rows'] / result['elapsed'] if result['elapsed'] else 0
+            self.stdout.write(
+                f'分片{index} [{result["start"]}, {result["end"]}): {result["rows"]}行，'
+                f'新增{result["created"]}，更新{result["updated"]}，未变化{result["unchanged"]}，'
+                f'失败{result["failed"]}，'
+                f'{rate:.0f}行/秒'
+            )
+
+        rows = sum(result['rows'] for result in results)
+        rate = rows / elapsed if elapsed else 0
+        summary = (f'共导入{rows}行，新增{sum(result["created"] for result in results)}，'
+                   f'更新{sum(result["updated"] for result in results)}，'
+                   f'未变化{sum(result["unchanged"] for result in results)}，'
+                   f'失败{sum(result["failed"] for result in results)}，'
+                   f'耗时{elapsed:.1f}秒，{rate:.0f}行/秒')
+
+        unfinished = [result for result in results if result['error']]
+        if unfinished:
+            # 之后的分片即使已完成，重新导入也只是幂等upsert
+            resume_at = unfinished[0]['committed']
+            raise CommandError(f'{summary}。导入未完成: {unfinished[0]["error"]}，'
+                               f'可使用 --offset {resume_at} 续传')
+
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -2,6 +2,15 @@ from django.db import models
 from django.utils import timezone
 
 
+LOG_LEVEL_CHOICES = [
+    ('DEBUG', '调试'),
+    ('INFO', '信息'),
+    ('WARNING', '警告'),
+    ('ERROR', '错误'),
+    ('CRITICAL', '严重'),
+]
+
+
 class CrawlTask(models.Model):
     """爬虫任务模型"""
     
@@ -18,6 +27,7 @@ class CrawlTask(models.Model):
         ('artist', '艺术家爬取'),
         ('album', '专辑爬取'),
         ('playlist', '歌单爬取'),
+        ('lyrics', '歌词补全'),
     ]
     
     name = models.CharField(max_length=200, verbose_name='任务名称')
@@ -31,12 +41,24 @@ class CrawlTask(models.Model):
     
     # 爬取配置
     max_pages = models.PositiveIntegerField(default=1, verbose_name='最大页数')
-    delay_seconds = models.PositiveIntegerField(default=1, verbose_name='延迟秒数')
+    delay_seconds = models.PositiveIntegerField(default=0, verbose_name='延迟秒数',
+                                                help_text='请求间的额外间隔，0表示只按平台限流')
+    concurrency = models.PositiveIntegerField(default=1, verbose_name='并发请求数')
+    use_http_cache = models.BooleanField(default=False, verbose_name='使用响应缓存')
+    incremental = models.BooleanField(default=False, verbose_name='增量爬取',
+                                      help_text='跳过内容未变化的歌曲，某页没有新数据时停止翻页')
+    log_level = models.CharField(max_length=10, choices=LOG_LEVEL_CHOICES, default='INFO',
+                                 verbose_name='日志级别', help_text='低于该级别的日志不写入数据库')
     
     # 结果统计
     total_found = models.PositiveIntegerField(default=0, verbose_name='发现总数')
     total_saved = models.PositiveIntegerField(default=0, verbose_name='保存总数')
     total_failed = models.PositiveIntegerField(default=0, verbose_name='失败总数')
+    total_created = models.PositiveIntegerField(default=0, verbose_name='新增数')
+    total_updated = models.PositiveIntegerField(default=0, verbose_name='更新数')
+    total_unchanged = models.PositiveIntegerField(default=0, verbose_name='未变化数')
+    cache_hits = models.PositiveIntegerField(default=0, verbose_name='缓存命中数')
+    cache_misses = models.PositiveIntegerField(default=0, verbose_name='缓存未命中数')
     
     # 时间字段
     started_at = models.DateTimeField(blank=True, null=True, verbose_name='开始时间')
@@ -59,18 +81,17 @@ class CrawlTask(models.Model):
         elif self.started_at:
             return timezone.now() - self.started_at
         return None
+    
+    def cache_hit_ratio(self):
+        """计算响应缓存命中率"""
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / total if total else 0
 
 
 class CrawlLog(models.Model):
     """爬虫日志模型"""
     
-    LEVEL_CHOICES = [
-        ('DEBUG', '调试'),
-        ('INFO', '信息'),
-        ('WARNING', '警告'),
-        ('ERROR', '错误'),
-        ('CRITICAL', '严重'),
-    ]
+    LEVEL_CHOICES = LOG_LEVEL_CHOICES
     
     task = models.ForeignKey(CrawlTask, on_delete=models.CASCADE, related_name='logs', verbose_name='关联任务')
     level = models.CharField(max_length=10, choices=LEVEL_CHOICES, verbose_name='日志级别')
@@ -81,6 +102,34 @@ class CrawlLog(models.Model):
         verbose_name = '爬虫日志'
         verbose_name_plural = '爬虫日志'
         ordering = ['-created_at']
+        # 日志按任务(和级别)过滤、按时间倒序读取; 任务的日志接口用游标分页，按主键倒序
+        # (只按任务过滤时由外键索引提供顺序，二级索引本身包含主键)
+        indexes = [
+            models.Index(fields=['task', 'level', 'created_at'], name='crawllog_task_level_idx'),
+            models.Index(fields=['task', 'created_at'], name='crawllog_task_created_at_idx'),
+            models.Index(fields=['task', 'level', 'id'], name='crawllog_task_level_id_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.level}: {self.message[:50]}"
+
+
+class CrawlWatermark(models.Model):
+    """增量爬取水位线，记录每个 (平台, 任务类型, 关键词/目标URL) 最近一次完整爬取的结果"""
+    
+    platform = models.ForeignKey('music.Platform', on_delete=models.CASCADE, verbose_name='目标平台')
+    task_type = models.CharField(max_length=20, choices=CrawlTask.TYPE_CHOICES, verbose_name='任务类型')
+    target = models.CharField(max_length=500, verbose_name='关键词/目标URL')
+    last_task = models.ForeignKey(CrawlTask, on_delete=models.SET_NULL, blank=True, null=True,
+                                  related_name='+', verbose_name='最近任务')
+    pages_crawled = models.PositiveIntegerField(default=0, verbose_name='最近爬取页数')
+    new_items = models.PositiveIntegerField(default=0, verbose_name='最近新增/变化数')
+    last_crawled_at = models.DateTimeField(default=timezone.now, verbose_name='最近爬取时间')
+    
+    class Meta:
+        verbose_name = '爬取水位线'
+        verbose_name_plural = '爬取水位线'
+        unique_together = ['platform', 'task_type', 'target']
         
     def __str__(self):
-        return f"{self.level}: {self.message[:50]}"
\ No newline at end of file
+        return f"{self.platform.name} {self.task_type}: {self.target}"
\ No newline at end of file
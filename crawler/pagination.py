@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CrawlLogCursorPagination(CursorPagination):
+    """爬虫日志的键集分页，按主键倒序，翻页不受新写入日志的影响"""
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,80 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from crawler.models import CrawlTask
+
+# 进度写入时更新的列，不包含状态等可能被并发修改的字段
+PROGRESS_FIELDS = ['progress', 'total_found', 'total_saved', 'total_failed',
+                   'total_created', 'total_updated', 'total_unchanged',
+                   'cache_hits', 'cache_misses']
+
+# 爬虫返回的统计项 -> 任务字段
+RESULT_FIELDS = {
+    'found': 'total_found',
+    'saved': 'total_saved',
+    'failed': 'total_failed',
+    'created': 'total_created',
+    'updated': 'total_updated',
+    'unchanged': 'total_unchanged',
+}
+
+
+def progress_cache_key(task_id):
+    return f'crawler:task:{task_id}:progress'
+
+
+def progress_snapshot(task):
+    """任务进度快照"""
+    data = {field: getattr(task, field) for field in PROGRESS_FIELDS}
+    data['id'] = task.id
+    data['status'] = task.status
+    data['updated_at'] = timezone.now().isoformat()
+    return data
+
+
+def publish_progress(task):
+    """将任务进度发布到缓存，供查询接口直接读取"""
+    cache.set(progress_cache_key(task.id), progress_snapshot(task),
+              settings.CRAWLER_PROGRESS_CACHE_TIMEOUT)
+
+
+def get_published_progress(task_id):
+    """读取已发布的任务进度，不存在时返回None"""
+    return cache.get(progress_cache_key(task_id))
+
+
+class ProgressReporter:
+    """合并写入的任务进度
+
+    report 只更新内存中的任务对象，距上次写入超过 interval 秒才写库；
+    写库时只更新进度和计数列，不会覆盖并发修改的任务状态(如取消)。
+    """
+
+    def __init__(self, task, interval):
+        self.task = task
+        self.interval = interval
+        self._last_write = 0
+        self._lock = threading.Lock()
+
+    def report(self, progress, result=None, force=False):
+        """记录进度，result 为当前累计的统计，键见 RESULT_FIELDS"""
+        with self._lock:
+            self.task.progress = progress
+            if result is not None:
+                for key, field in RESULT_FIELDS.items():
+                    setattr(self.task, field, result.get(key, 0))
+
+            now = time.monotonic()
+            if not force and now - self._last_write < self.interval:
+                return
+            self._last_write = now
+
+        self.flush()
+
+    def flush(self):
+        """立即写入当前进度"""
+        values = {field: getattr(self.task, field) for field in PROGRESS_FIELDS}
+        CrawlTask.objects.filter(id=self.task.id).update(updated_at=timezone.now(), **values)
+        publish_progress(self.task)
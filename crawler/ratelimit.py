@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+import redis
+from django.conf import settings
+
+logger = logging.getLogger('crawler')
+
+
+# 令牌桶脚本: 按时间补充令牌，取到令牌返回0，否则返回需要等待的秒数
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = burst
+    ts = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class LocalTokenBucket:
+    """进程内令牌桶，用于测试或Redis不可用时"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """尝试取一个令牌，返回需要等待的秒数，0表示已取到"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """阻塞直到取到令牌"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class RedisTokenBucket:
+    """通过Redis在多个Worker进程间共享的令牌桶"""
+
+    def __init__(self, client, key, rate, burst):
+        self.client = client
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._fallback = None
+
+    def try_acquire(self):
+        """尝试取一个令牌，返回需要等待的秒数，0表示已取到"""
+        try:
+            return float(self._script(keys=[self.key], args=[self.rate, self.burst]))
+        except redis.RedisError as e:
+            # Redis不可用时退化为进程内限流，不中断爬取
+            if self._fallback is None:
+                logger.warning(f'限流器无法连接Redis，改用进程内限流 {self.key}: {str(e)}')
+                self._fallback = LocalTokenBucket(self.rate, self.burst)
+            return self._fallback.try_acquire()
+
+    def acquire(self):
+        """阻塞直到取到令牌"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+_local_buckets = {}
+_local_buckets_lock = threading.Lock()
+_redis_client = None
+
+
+def get_redis_client():
+    """获取限流器使用的Redis连接(进程内复用)"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.CRAWLER_RATE_LIMIT_REDIS_URL)
+    return _redis_client
+
+
+def get_rate_limiter(platform):
+    """按平台获取限流器，速率和突发数取自平台配置"""
+    rate = max(platform.rate_limit, 0.001)
+    burst = max(platform.rate_burst, 1)
+
+    if settings.CRAWLER_RATE_LIMIT_BACKEND == 'redis':
+        key = f'melody_hunter:ratelimit:platform:{platform.pk}'
+        return RedisTokenBucket(get_redis_client(), key, rate, burst)
+
+    with _local_buckets_lock:
+        bucket = _local_buckets.get(platform.pk)
+        if bucket is None or (bucket.rate, bucket.burst) != (rate, burst):
+            bucket = LocalTokenBucket(rate, burst)
+            _local_buckets[platform.pk] = bucket
+        return bucket
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from django.conf import settings
+from django.utils import timezone
+
+
+# 可重试的HTTP状态码: 限流和服务端错误
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt, base, cap):
+    """带随机抖动的指数退避时间(full jitter)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(response):
+    """解析 Retry-After 头，支持秒数和HTTP日期两种格式，无法解析时返回None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """平台熔断器
+
+    连续失败达到 failure_threshold 次后熔断(open)，期间请求直接失败；
+    经过 reset_timeout 秒进入半开(half-open)状态，只放行一个探测请求，
+    探测成功则恢复(closed)，失败则重新熔断。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probing = False
+        self._probe_started_at = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """判断当前是否允许发出请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            # 半开状态只放行一个探测请求，探测长时间无结果时允许重新探测
+            now = time.monotonic()
+            if self._probing and now - self._probe_started_at < self.reset_timeout:
+                return False
+            self._probing = True
+            self._probe_started_at = now
+            return True
+
+    def record_success(self):
+        """记录一次成功请求"""
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """记录一次失败请求，返回是否因此熔断"""
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                tripped = self.state != self.OPEN
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return tripped
+            return False
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(platform):
+    """获取平台熔断器，同一Worker进程内的所有任务共用"""
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(platform.pk)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                settings.CRAWLER_CIRCUIT_FAILURE_THRESHOLD,
+                settings.CRAWLER_CIRCUIT_RESET_TIMEOUT
+            )
+            _circuit_breakers[platform.pk] = breaker
+        return breaker
@@ -8,22 +8,50 @@ class CrawlLogSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class CrawlTaskListSerializer(serializers.ModelSerializer):
+    """任务列表使用的精简序列化器，日志只给出数量和最后一条错误"""
+    platform_name = serializers.CharField(source='platform.name', read_only=True)
+    log_count = serializers.IntegerField(read_only=True)
+    last_error = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = CrawlTask
+        fields = ['id', 'name', 'platform', 'platform_name', 'task_type', 
+                 'search_keyword', 'status', 'progress', 'total_found', 
+                 'total_saved', 'total_failed', 'started_at', 'completed_at', 
+                 'created_at', 'log_count', 'last_error']
+
+
 class CrawlTaskSerializer(serializers.ModelSerializer):
     platform_name = serializers.CharField(source='platform.name', read_only=True)
     duration = serializers.CharField(read_only=True)
-    logs = CrawlLogSerializer(many=True, read_only=True)
+    cache_hit_ratio = serializers.FloatField(read_only=True)
+    log_count = serializers.IntegerField(read_only=True)
+    last_error = serializers.CharField(read_only=True)
     
     class Meta:
         model = CrawlTask
         fields = ['id', 'name', 'platform', 'platform_name', 'task_type', 
                  'target_url', 'search_keyword', 'status', 'progress', 
-                 'max_pages', 'delay_seconds', 'total_found', 'total_saved', 
-                 'total_failed', 'started_at', 'completed_at', 'created_at', 
-                 'updated_at', 'duration', 'logs']
+                 'max_pages', 'delay_seconds', 'concurrency', 'use_http_cache', 
+                 'incremental', 'log_level', 'total_found', 'total_saved', 'total_failed', 
+                 'total_created', 'total_updated', 'total_unchanged', 
+                 'cache_hits', 'cache_misses', 'cache_hit_ratio', 'started_at', 
+                 'completed_at', 'created_at', 'updated_at', 'duration', 
+                 'log_count', 'last_error']
+
+
+class CrawlTaskDetailSerializer(CrawlTaskSerializer):
+    """包含全部日志的任务详情，仅在 ?expand=logs 时使用"""
+    logs = CrawlLogSerializer(many=True, read_only=True)
+    
+    class Meta(CrawlTaskSerializer.Meta):
+        fields = CrawlTaskSerializer.Meta.fields + ['logs']
 
 
 class CreateCrawlTaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = CrawlTask
         fields = ['name', 'platform', 'task_type', 'target_url', 
-                 'search_keyword', 'max_pages', 'delay_seconds']
\ No newline at end of file
+                 'search_keyword', 'max_pages', 'delay_seconds', 'concurrency',
+                 'use_http_cache', 'incremental', 'log_level']
\ No newline at end of file
@@ -1,11 +1,30 @@
 import requests
 import time
 import random
+import queue
+import threading
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
+from django.conf import settings
+from django.db import connections, transaction
 from django.utils import timezone
 from music.models import Song, Artist, Album, Platform
-from crawler.models import CrawlLog
+from music.search import index_songs
+from music.leaderboard import record_songs
+from music.responsecache import invalidate_platforms
+from music.dedup import safe_assign_works
+from crawler.identity import get_identity_map
+from crawler.writer import CatalogWriter, apply_changes
+from crawler.models import CrawlWatermark
+from crawler.lyrics import lyrics_candidates, save_lyrics
+from crawler.logsink import CrawlLogBuffer
+from crawler.progress import ProgressReporter
+from crawler.cancellation import CancellationToken
+from crawler.ratelimit import get_rate_limiter
+from crawler.httpcache import ResponseCache, get_response_cache
+from crawler.resilience import (
+    RETRYABLE_STATUS_CODES, backoff_delay, parse_retry_after, get_circuit_breaker
+)
 import logging
 
 logger = logging.getLogger('crawler')
@@ -14,11 +33,39 @@ logger = logging.getLogger('crawler')
 class BaseMusicSpider:
     """音乐爬虫基础类"""
     
+    # 是否支持按页码范围拆分为多个分片并行执行(见 crawler.tasks)
+    supports_sharding = False
+    
+    # 批量写入时每条SQL包含的最大行数
+    bulk_batch_size = 500
+    
     def __init__(self, task):
         self.task = task
         self.platform = task.platform
+        # 分片执行时只爬取 (起始页, 结束页)，为None时爬取全部页
+        self.page_range = None
         self.session = requests.Session()
         self.ua = UserAgent()
+        self._next_request_at = 0
+        self._throttle_lock = threading.Lock()
+        self.rate_limiter = get_rate_limiter(self.platform)
+        self.circuit_breaker = get_circuit_breaker(self.platform)
+        self.response_cache = get_response_cache() if task.use_http_cache else None
+        self._stats_lock = threading.Lock()
+        self.progress_reporter = ProgressReporter(task, settings.CRAWLER_PROGRESS_INTERVAL)
+        self.cancel_token = CancellationToken(
+            task.id,
+            check_interval=settings.CRAWLER_CANCEL_CHECK_INTERVAL,
+            db_interval=settings.CRAWLER_CANCEL_DB_CHECK_INTERVAL
+        )
+        self.identity_map = get_identity_map()
+        self.writer = CatalogWriter(self.platform, self.identity_map, self.bulk_batch_size)
+        self.log_buffer = CrawlLogBuffer(
+            task,
+            level=task.log_level,
+            buffer_size=settings.CRAWLER_LOG_BUFFER_SIZE,
+            flush_interval=settings.CRAWLER_LOG_FLUSH_INTERVAL
+        )
         self.setup_session()
         
     def setup_session(self):
@@ -33,24 +80,78 @@ class BaseMusicSpider:
         self.session.headers.update(headers)
         
     def log(self, level, message):
-        """记录日志"""
-        CrawlLog.objects.create(
-            task=self.task,
-            level=level,
-            message=message
-        )
+        """记录日志，低于任务日志级别的只输出到文件/控制台"""
+        self.log_buffer.write(level, message)
         getattr(logger, level.lower())(f'Task {self.task.id}: {message}')
         
+    def flush_logs(self):
+        """将缓冲中的日志写入数据库"""
+        self.log_buffer.flush()
+        
+    def throttle(self):
+        """礼貌延迟
+        
+        从平台令牌桶取令牌，保证所有Worker对同一平台的总速率不超过平台配置，
+        令牌充足时不等待。任务设置了 delay_seconds 时，另外控制任务自身的节奏:
+        相邻两次请求的发起间隔不小于 random.uniform(1, delay_seconds)，
+        并发抓取时所有线程共用同一个节奏。
+        """
+        if self.task.delay_seconds:
+            with self._throttle_lock:
+                now = time.monotonic()
+                start_at = max(now, self._next_request_at)
+                self._next_request_at = start_at + random.uniform(1, self.task.delay_seconds)
+            if start_at > now:
+                time.sleep(start_at - now)
+        self.rate_limiter.acquire()
+        
     def get_page(self, url, params=None):
-        """获取页面内容"""
+        """获取页面内容
+        
+        任务开启响应缓存时，有效期内的缓存直接返回且不占用礼貌延迟；
+        过期的缓存带 If-None-Match/If-Modified-Since 重新验证，304时沿用缓存。
+        缓存文件无法读写(如被锁定或损坏)时不使用缓存，直接请求。
+        """
+        cache_key = None
+        cached = None
+        if self.response_cache is not None:
+            try:
+                cache_key = ResponseCache.make_key('GET', url, params)
+                cached = self.response_cache.get(cache_key)
+            except Exception as e:
+                self.log('WARNING', f'读取响应缓存失败，不使用缓存 {url}: {str(e)}')
+                cache_key = None
+                cached = None
+            if cached and cached.is_fresh(self.platform.cache_ttl):
+                self._count_cache(hit=True)
+                self.log('DEBUG', f'命中响应缓存: {url}')
+                return cached.to_response()
+        
         try:
-            # 添加随机延迟
-            time.sleep(random.uniform(1, self.task.delay_seconds))
+            headers = cached.conditional_headers() if cached else None
+            response = self.request(url, params=params, headers=headers)
+            if response is None:
+                return None
+            
+            if cached and response.status_code == 304:
+                try:
+                    self.response_cache.touch(cache_key)
+                except Exception as e:
+                    self.log('WARNING', f'更新响应缓存失败 {url}: {str(e)}')
+                self._count_cache(hit=True)
+                self.log('DEBUG', f'响应缓存重新验证通过: {url}')
+                return cached.to_response()
             
-            response = self.session.get(url, params=params, timeout=30)
             response.raise_for_status()
             response.encoding = response.apparent_encoding
             
+            if cache_key is not None:
+                self._count_cache(hit=False)
+                try:
+                    self.response_cache.set(cache_key, response)
+                except Exception as e:
+                    self.log('WARNING', f'写入响应缓存失败 {url}: {str(e)}')
+            
             self.log('DEBUG', f'成功获取页面: {url}')
             return response
             
@@ -58,6 +159,120 @@ class BaseMusicSpider:
             self.log('ERROR', f'获取页面失败 {url}: {str(e)}')
             return None
     
+    def request(self, url, params=None, headers=None):
+        """发送GET请求，对超时、连接错误、429和5xx按指数退避重试
+        
+        429/503 带 Retry-After 时按其等待。平台熔断时不发请求，直接返回None；
+        重试用尽后返回最后一次响应或抛出最后一次异常。
+        """
+        max_retries = settings.CRAWLER_RETRY_MAX_ATTEMPTS
+        for attempt in range(max_retries + 1):
+            if not self.circuit_breaker.allow_request():
+                self.log('WARNING', f'平台{self.platform.name}已熔断，跳过请求: {url}')
+                return None
+            
+            # 添加随机延迟
+            self.throttle()
+            
+            response = None
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=30)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if attempt >= max_retries:
+                    self.circuit_breaker.record_failure()
+                    raise
+                reason = str(e)
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.circuit_breaker.record_success()
+                    return response
+                if attempt >= max_retries:
+                    self.circuit_breaker.record_failure()
+                    return response
+                reason = f'HTTP {response.status_code}'
+            
+            if self.circuit_breaker.record_failure():
+                self.log('ERROR', f'平台{self.platform.name}连续请求失败，已熔断')
+            
+            delay = parse_retry_after(response) if response is not None else None
+            if delay is None:
+                delay = backoff_delay(attempt, settings.CRAWLER_RETRY_BACKOFF_BASE,
+                                      settings.CRAWLER_RETRY_BACKOFF_MAX)
+            elif delay > settings.CRAWLER_RETRY_BACKOFF_MAX:
+                self.log('WARNING', f'Retry-After {delay:.0f}秒超过上限，放弃重试: {url}')
+                return response
+            
+            self.log('WARNING', f'请求失败({reason})，{delay:.1f}秒后第{attempt + 1}次重试: {url}')
+            time.sleep(delay)
+    
+    def _count_cache(self, hit):
+        """累计任务的响应缓存命中统计"""
+        with self._stats_lock:
+            if hit:
+                self.task.cache_hits += 1
+            else:
+                self.task.cache_misses += 1
+    
+    def fetch_pages(self, page_requests, concurrency=None):
+        """按完成顺序产出 (标识, 响应)，响应获取失败时为None
+        
+        page_requests 为 [(标识, url, params)]。concurrency 大于1时由线程池
+        并发抓取(生产者)，调用方在当前线程中解析和入库(消费者)；结果队列有界，
+        入库跟不上时抓取线程会阻塞等待。
+        """
+        if concurrency is None:
+            concurrency = min(self.task.concurrency, settings.CRAWLER_MAX_CONCURRENCY)
+        
+        if concurrency <= 1 or len(page_requests) <= 1:
+            for key, url, params in page_requests:
+                yield key, self.get_page(url, params)
+            return
+        
+        pending = queue.Queue()
+        for page_request in page_requests:
+            pending.put(page_request)
+        results = queue.Queue(maxsize=concurrency * 2)
+        stopped = threading.Event()
+        
+        def worker():
+            try:
+                while not stopped.is_set():
+                    try:
+                        key, url, params = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        response = self.get_page(url, params)
+                    except Exception as e:
+                        # 每个请求都必须产出结果，否则消费者会一直等待
+                        self.log('ERROR', f'获取页面失败 {url}: {str(e)}')
+                        response = None
+                    while not stopped.is_set():
+                        try:
+                            results.put((key, response), timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+            finally:
+                # 日志缓冲可能在抓取线程中写库，释放线程自己的数据库连接
+                connections.close_all()
+        
+        workers = [
+            threading.Thread(target=worker, daemon=True)
+            for _ in range(min(concurrency, len(page_requests)))
+        ]
+        for thread in workers:
+            thread.start()
+        
+        try:
+            for _ in range(len(page_requests)):
+                yield results.get()
+        finally:
+            # 调用方提前结束时通知抓取线程退出
+            stopped.set()
+            for thread in workers:
+                thread.join()
+    
     def parse_page(self, response):
         """解析页面内容"""
         if not response:
@@ -66,6 +281,13 @@ class BaseMusicSpider:
     
     def save_artist(self, artist_data):
         """保存艺术家信息"""
+        key = self.identity_map.key(Artist, self.platform, artist_data['platform_id'])
+        pk = self.identity_map.lookup(key, artist_data)
+        if pk:
+            # 已知且数据未变化，跳过查询和写入
+            return Artist(pk=pk, platform=self.platform,
+                          platform_id=artist_data['platform_id'], name=artist_data['name'])
+        
         try:
             artist, created = Artist.objects.get_or_create(
                 platform=self.platform,
@@ -80,12 +302,14 @@ class BaseMusicSpider:
             if created:
                 self.log('INFO', f'新增艺术家: {artist.name}')
             else:
-                # 更新信息
-                artist.name = artist_data['name']
-                artist.biography = artist_data.get('biography', artist.biography)
-                artist.platform_url = artist_data.get('platform_url', artist.platform_url)
-                artist.save()
+                # 只更新有变化的字段
+                self._save_changes(artist, {
+                    'name': artist_data['name'],
+                    'biography': artist_data.get('biography', artist.biography),
+                    'platform_url': artist_data.get('platform_url', artist.platform_url),
+                })
                 
+            self.identity_map.put(key, artist.pk, artist_data)
             return artist
             
         except Exception as e:
@@ -94,6 +318,13 @@ class BaseMusicSpider:
     
     def save_album(self, album_data, artist):
         """保存专辑信息"""
+        key = self.identity_map.key(Album, self.platform, album_data['platform_id'])
+        pk = self.identity_map.lookup(key, album_data)
+        if pk:
+            # 已知且数据未变化，跳过查询和写入
+            return Album(pk=pk, platform=self.platform, artist=artist,
+                         platform_id=album_data['platform_id'], title=album_data['title'])
+        
         try:
             album, created = Album.objects.get_or_create(
                 platform=self.platform,
@@ -110,12 +341,14 @@ class BaseMusicSpider:
             if created:
                 self.log('INFO', f'新增专辑: {album.title}')
             else:
-                # 更新信息
-                album.title = album_data['title']
-                album.description = album_data.get('description', album.description)
-                album.platform_url = album_data.get('platform_url', album.platform_url)
-                album.save()
+                # 只更新有变化的字段
+                self._save_changes(album, {
+                    'title': album_data['title'],
+                    'description': album_data.get('description', album.description),
+                    'platform_url': album_data.get('platform_url', album.platform_url),
+                })
                 
+            self.identity_map.put(key, album.pk, album_data)
             return album
             
         except Exception as e:
@@ -123,7 +356,10 @@ class BaseMusicSpider:
             return None
     
     def save_song(self, song_data, artist, album=None):
-        """保存歌曲信息"""
+        """保存歌曲信息
+        
+        返回的歌曲带 save_status 属性: 'created'、'updated' 或 'unchanged'。
+        """
         try:
             song, created = Song.objects.get_or_create(
                 platform=self.platform,
@@ -139,22 +375,27 @@ class BaseMusicSpider:
                     'audio_url': song_data.get('audio_url', ''),
                     'play_count': song_data.get('play_count', 0),
                     'like_count': song_data.get('like_count', 0),
+                    'content_hash': song_data.get('content_hash', ''),
                 }
             )
             
             if created:
                 self.log('INFO', f'新增歌曲: {song.title} - {artist.name}')
+                song.save_status = 'created'
             else:
-                # 更新信息
-                song.title = song_data['title']
-                song.duration = song_data.get('duration', song.duration)
-                song.lyrics = song_data.get('lyrics', song.lyrics)
-                song.genre = song_data.get('genre', song.genre)
-                song.platform_url = song_data.get('platform_url', song.platform_url)
-                song.audio_url = song_data.get('audio_url', song.audio_url)
-                song.play_count = song_data.get('play_count', song.play_count)
-                song.like_count = song_data.get('like_count', song.like_count)
-                song.save()
+                # 只更新有变化的字段
+                changed = self._save_changes(song, {
+                    'title': song_data['title'],
+                    'duration': song_data.get('duration', song.duration),
+                    'lyrics': song_data.get('lyrics', song.lyrics),
+                    'genre': song_data.get('genre', song.genre),
+                    'platform_url': song_data.get('platform_url', song.platform_url),
+                    'audio_url': song_data.get('audio_url', song.audio_url),
+                    'play_count': song_data.get('play_count', song.play_count),
+                    'like_count': song_data.get('like_count', song.like_count),
+                    'content_hash': song_data.get('content_hash', song.content_hash),
+                })
+                song.save_status = 'updated' if changed else 'unchanged'
                 
             return song
             
@@ -162,11 +403,200 @@ class BaseMusicSpider:
             self.log('ERROR', f'保存歌曲失败: {str(e)}')
             return None
     
-    def update_progress(self, current, total):
-        """更新任务进度"""
+    def _save_changes(self, instance, values):
+        """与已保存的值逐字段比较，只UPDATE有变化的列
+        
+        数据完全一致时不写入，updated_at 保持不变。返回有变化的字段名列表。
+        """
+        changed = apply_changes(instance, values)
+        if changed:
+            instance.save(update_fields=changed + ['updated_at'])
+        return changed
+    
+    def save_page(self, items):
+        """批量保存一页解析结果
+        
+        items 为 parse 得到的条目列表，每项形如
+        {'artist': artist_data, 'album': album_data 或 None, 'song': song_data}。
+        艺术家、专辑、歌曲分别按 (platform, platform_id) 做集合式upsert，
+        外键通过一次批量查询解析。增量任务先去掉内容指纹未变化的条目，
+        不再写入。返回按歌曲计数的
+        {'created': 新增数, 'updated': 更新数, 'unchanged': 未变化数, 'failed': 失败数}。
+        """
+        result = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+        
+        valid_items = []
+        for item in items:
+            if self._is_valid_item(item):
+                valid_items.append(item)
+            else:
+                result['failed'] += 1
+        
+        if valid_items and self.task.incremental:
+            valid_items, result['unchanged'] = self.writer.drop_unchanged(valid_items)
+            if not valid_items:
+                self.log('INFO', f'本页{result["unchanged"]}项均未变化，跳过写入')
+        
+        if not valid_items:
+            return result
+        
+        try:
+            with transaction.atomic():
+                created, updated, unchanged, song_ids = self._bulk_save_items(valid_items)
+            result['created'] += created
+            result['updated'] += updated
+            result['unchanged'] += unchanged
+            # 批量写入不触发信号，需要手动更新全文索引和热门榜单
+            index_songs(Song.objects.filter(pk__in=song_ids))
+            record_songs(Song.objects.filter(pk__in=song_ids))
+            safe_assign_works(song_ids)
+            
+        except Exception as e:
+            # 批量写入失败时逐条保存，避免一条脏数据拖垮整页
+            self.log('WARNING', f'批量保存失败，改为逐条保存: {str(e)}')
+            # 事务已回滚，映射中记录的主键可能失效
+            self.identity_map.clear()
+            for item in valid_items:
+                status = self._save_item(item)
+                result[status or 'failed'] += 1
+        
+        if result['created'] or result['updated']:
+            # 批量写入不触发信号，需要手动使该平台的接口缓存失效
+            invalidate_platforms([self.platform.pk])
+        
+        self.log('INFO', f'批量保存完成: 新增{result["created"]}项，'
+                         f'更新{result["updated"]}项，未变化{result["unchanged"]}项，'
+                         f'失败{result["failed"]}项')
+        return result
+    
+    def _is_valid_item(self, item):
+        """检查条目是否包含必需字段"""
+        return self.writer.is_valid_item(item)
+    
+    def _save_item(self, item):
+        """逐条保存单个条目，批量写入失败时使用
+        
+        返回歌曲的保存结果 'created'、'updated' 或 'unchanged'，失败时返回None。
+        """
+        artist = self.save_artist(item['artist'])
+        if not artist:
+            return None
+        album = None
+        if item.get('album'):
+            album = self.save_album(item['album'], artist)
+        song_data = dict(item['song'], content_hash=self.writer.content_hash(item))
+        song = self.save_song(song_data, artist, album)
+        return song.save_status if song is not None else None
+    
+    def _bulk_save_items(self, items):
+        """在同一事务中批量写入艺术家、专辑和歌曲，返回歌曲的 (新增数, 更新数, 未变化数, 主键列表)"""
+        return self.writer.write(items)
+    
+    def watermark_target(self):
+        """增量爬取水位线的目标: 搜索任务为关键词，其他任务为目标URL"""
+        if self.task.task_type == 'search':
+            return self.task.search_keyword
+        return self.task.target_url
+    
+    def get_watermark(self):
+        """返回本任务目标的水位线，从未完整爬取过时为None"""
+        return CrawlWatermark.objects.filter(
+            platform=self.platform,
+            task_type=self.task.task_type,
+            target=self.watermark_target()
+        ).first()
+    
+    def update_watermark(self, pages_crawled, new_items):
+        """记录本次爬取的水位线"""
+        CrawlWatermark.objects.update_or_create(
+            platform=self.platform,
+            task_type=self.task.task_type,
+            target=self.watermark_target(),
+            defaults={
+                'last_task': self.task,
+                'pages_crawled': pages_crawled,
+                'new_items': new_items,
+                'last_crawled_at': timezone.now(),
+            }
+        )
+    
+    def lyrics_request(self, platform_id):
+        """返回获取歌曲歌词的 (url, params)，支持歌词补全的子类需要实现"""
+        raise NotImplementedError(f'{self.platform.name}暂不支持歌词补全')
+    
+    def parse_lyrics(self, response):
+        """从响应中解析歌词文本，平台没有歌词时返回空字符串，响应无效时返回None"""
+        raise NotImplementedError(f'{self.platform.name}暂不支持歌词补全')
+    
+    def crawl_lyrics(self):
+        """歌词补全: 按主键顺序分批取出缺少或过期歌词的歌曲，并发获取后批量写入
+        
+        请求与普通爬取一样受任务并发数、礼貌延迟和平台限流约束。max_pages 为本次
+        处理的批数上限，每批 CRAWLER_LYRICS_BATCH_SIZE 首。写入的歌曲记录获取时间，
+        不会再被选中，中断后重新运行即从剩余的歌曲继续；获取失败的歌曲留到下次运行。
+        """
+        self.log('INFO', f'开始补全歌词，最多{self.task.max_pages}批')
+        result = {'found': 0, 'saved': 0, 'failed': 0, 'created': 0, 'updated': 0, 'unchanged': 0}
+        
+        total_batches = self.task.max_pages
+        after = 0
+        for batch in range(1, total_batches + 1):
+            if self.is_cancelled():
+                self.log('WARNING', f'任务已取消，已处理{batch - 1}/{total_batches}批')
+                break
+            
+            songs = lyrics_candidates(self.platform, after, settings.CRAWLER_LYRICS_BATCH_SIZE)
+            if not songs:
+                self.log('INFO', '没有待补全歌词的歌曲')
+                break
+            after = songs[-1][0]
+            result['found'] += len(songs)
+            
+            page_requests = [(pk, *self.lyrics_request(platform_id)) for pk, platform_id in songs]
+            lyrics_by_pk = {}
+            for pk, response in self.fetch_pages(page_requests):
+                # 取消后不再等待剩余请求，已获取的照常保存
+                if self.is_cancelled():
+                    break
+                lyrics = self.parse_lyrics(response) if response else None
+                if lyrics is None:
+                    result['failed'] += 1
+                else:
+                    lyrics_by_pk[pk] = lyrics
+            
+            updated, unchanged = save_lyrics(self.platform, lyrics_by_pk, self.bulk_batch_size)
+            result['saved'] += updated
+            result['updated'] += updated
+            result['unchanged'] += unchanged
+            self.log('INFO', f'第{batch}批歌词保存完成: 更新{updated}首，未变化{unchanged}首，'
+                             f'失败{len(songs) - len(lyrics_by_pk)}首')
+            self.update_progress(batch, total_batches, result)
+        
+        return result
+    
+    def update_progress(self, current, total, result=None):
+        """更新任务进度，按 CRAWLER_PROGRESS_INTERVAL 合并写入"""
+        if self.page_range is not None:
+            # 分片模式下由分片任务统一累加进度
+            return
         progress = int((current / total) * 100) if total > 0 else 0
-        self.task.progress = progress
-        self.task.save()
+        self.progress_reporter.report(progress, result, force=current >= total)
+        
+    def is_cancelled(self):
+        """任务是否已被取消，开销很小，可在每页和每条数据之间调用"""
+        return self.cancel_token.is_cancelled()
+        
+    def close(self):
+        """任务结束时调用，输出本次运行的统计信息并写入剩余日志"""
+        if self.response_cache is not None:
+            self.log('INFO', f'响应缓存统计: 命中{self.task.cache_hits}次，'
+                             f'未命中{self.task.cache_misses}次，'
+                             f'命中率{self.task.cache_hit_ratio():.2%}')
+        
+        stats = self.identity_map.stats()
+        self.log('INFO', f'实体映射统计: 命中{stats["hits"]}次，未命中{stats["misses"]}次，'
+                         f'命中率{stats["hit_ratio"]:.2%}，缓存{stats["size"]}项')
+        self.flush_logs()
         
     def crawl(self):
         """爬取方法，子类需要实现"""
@@ -1,14 +1,18 @@
 import re
 import json
+from crawler.lyrics import strip_lrc
 from .base import BaseMusicSpider
 
 
 class NeteaseSpider(BaseMusicSpider):
     """网易云音乐爬虫"""
     
+    supports_sharding = True
+    
     def __init__(self, task):
         super().__init__(task)
-        self.base_url = 'https://music.163.com'
+        # 以平台配置的地址为准，便于指向本地模拟服务进行测试
+        self.base_url = (self.platform.base_url or 'https://music.163.com').rstrip('/')
         
     def crawl(self):
         """执行爬取任务"""
@@ -29,17 +33,24 @@ class NeteaseSpider(BaseMusicSpider):
                 result = self.crawl_album()
             elif self.task.task_type == 'playlist':
                 result = self.crawl_playlist()
+            elif self.task.task_type == 'lyrics':
+                result = self.crawl_lyrics()
             else:
                 raise ValueError(f'不支持的任务类型: {self.task.task_type}')
                 
         except Exception as e:
             self.log('ERROR', f'爬取过程中发生错误: {str(e)}')
             result['failed'] += 1
+            result['error'] = str(e)
             
         return result
     
     def crawl_search(self):
-        """搜索爬取"""
+        """搜索爬取
+        
+        增量任务在该关键词已有水位线时，某页的歌曲全部未变化即停止翻页；
+        首次爬取不提前停止(其他关键词保存过的歌曲也会显示为未变化)。
+        """
         keyword = self.task.search_keyword
         if not keyword:
             raise ValueError('搜索任务需要提供关键词')
@@ -49,38 +60,92 @@ class NeteaseSpider(BaseMusicSpider):
         # 这里是示例实现，实际需要根据网易云音乐的API进行调整
         search_url = f'{self.base_url}/api/search/get/web'
         
-        result = {'found': 0, 'saved': 0, 'failed': 0}
+        result = {'found': 0, 'saved': 0, 'failed': 0, 'created': 0, 'updated': 0, 'unchanged': 0}
         
-        for page in range(1, self.task.max_pages + 1):
-            params = {
+        first_page, last_page = self.page_range or (1, self.task.max_pages)
+        total_pages = last_page - first_page + 1
+        page_requests = [
+            (page, search_url, {
                 's': keyword,
                 'type': 1,  # 1表示单曲
                 'offset': (page - 1) * 30,
                 'limit': 30
-            }
+            })
+            for page in range(first_page, last_page + 1)
+        ]
+        
+        stop_early = self.task.incremental and self.get_watermark() is not None
+        new_items = 0
+        failed_pages = 0
+        # 并发抓取时页面按完成顺序返回，是否停止翻页按页码顺序判断:
+        # 某页没有新数据，且比它小的页都已处理完，才停止
+        page_unchanged = {}
+        next_page = first_page
+        stop_page = None
+        
+        # 进度按已处理页数计算
+        for done, (page, response) in enumerate(self.fetch_pages(page_requests), 1):
+            if self.is_cancelled():
+                self.log('WARNING', f'任务已取消，已处理{done - 1}/{total_pages}页')
+                break
             
-            response = self.get_page(search_url, params)
+            saved = None
             if not response:
                 result['failed'] += 1
-                continue
-                
-            try:
-                data = response.json()
-                songs = data.get('result', {}).get('songs', [])
-                
-                result['found'] += len(songs)
-                
-                for song_info in songs:
-                    if self.parse_and_save_song(song_info):
-                        result['saved'] += 1
-                    else:
-                        result['failed'] += 1
-                        
-                self.update_progress(page, self.task.max_pages)
+                failed_pages += 1
+            else:
+                try:
+                    data = response.json()
+                    songs = data.get('result', {}).get('songs', [])
+                    
+                    result['found'] += len(songs)
+                    
+                    items = []
+                    for song_info in songs:
+                        # 取消后不再解析剩余条目，已解析的照常保存
+                        if self.is_cancelled():
+                            break
+                        item = self.parse_song(song_info)
+                        if item:
+                            items.append(item)
+                        else:
+                            result['failed'] += 1
+                    
+                    saved = self.save_page(items)
+                    result['saved'] += saved['created'] + saved['updated']
+                    result['failed'] += saved['failed']
+                    for key in ('created', 'updated', 'unchanged'):
+                        result[key] += saved[key]
+                    new_items += saved['created'] + saved['updated']
+                    
+                except Exception as e:
+                    self.log('ERROR', f'解析搜索结果失败(第{page}页): {str(e)}')
+                    result['failed'] += 1
+                    failed_pages += 1
+            
+            page_unchanged[page] = bool(
+                saved and saved['unchanged'] and not (saved['created'] or saved['updated'])
+            )
+            while next_page in page_unchanged:
+                if stop_early and page_unchanged[next_page]:
+                    stop_page = next_page
+                    break
+                next_page += 1
+            if stop_page is not None:
+                self.log('INFO', f'第{stop_page}页没有新数据，停止翻页(已处理{done}/{total_pages}页)')
+                self.update_progress(total_pages, total_pages, result)
+                break
                 
-            except Exception as e:
-                self.log('ERROR', f'解析搜索结果失败: {str(e)}')
-                result['failed'] += 1
+            self.update_progress(done, total_pages, result)
+        
+        # 有页面失败时该关键词未完整爬取，不记录水位线，避免下次提前停止
+        if self.task.incremental and not self.is_cancelled():
+            if failed_pages:
+                self.log('WARNING', f'有{failed_pages}页获取或解析失败，不更新增量水位线')
+            else:
+                self.update_watermark(len(page_unchanged), new_items)
+        
+        result['failed_pages'] = failed_pages
                 
         return result
     
@@ -112,13 +177,27 @@ class NeteaseSpider(BaseMusicSpider):
         result = {'found': 0, 'saved': 0, 'failed': 0}
         return result
     
+    def lyrics_request(self, platform_id):
+        """歌词接口"""
+        return f'{self.base_url}/api/song/lyric', {'id': platform_id, 'lv': -1, 'tv': -1}
+    
+    def parse_lyrics(self, response):
+        """解析歌词接口返回的LRC歌词，纯音乐或未收录歌词时返回空字符串"""
+        try:
+            data = response.json()
+        except ValueError:
+            return None
+        if data.get('code') != 200:
+            return None
+        return strip_lrc((data.get('lrc') or {}).get('lyric', ''))
+    
     def extract_artist_id(self, url):
         """从URL中提取艺术家ID"""
         match = re.search(r'artist\?id=(\d+)', url)
         return match.group(1) if match else None
     
-    def parse_and_save_song(self, song_info):
-        """解析并保存歌曲信息"""
+    def parse_song(self, song_info):
+        """解析歌曲信息，返回供 save_page 使用的条目"""
         try:
             # 解析艺术家信息
             artist_info = song_info.get('artists', [{}])[0]
@@ -128,20 +207,15 @@ class NeteaseSpider(BaseMusicSpider):
                 'platform_url': f'{self.base_url}/artist?id={artist_info.get("id", "")}'
             }
             
-            artist = self.save_artist(artist_data)
-            if not artist:
-                return False
-            
             # 解析专辑信息
             album_info = song_info.get('album', {})
-            album = None
+            album_data = None
             if album_info:
                 album_data = {
                     'title': album_info.get('name', ''),
                     'platform_id': str(album_info.get('id', '')),
                     'platform_url': f'{self.base_url}/album?id={album_info.get("id", "")}'
                 }
-                album = self.save_album(album_data, artist)
             
             # 解析歌曲信息
             song_data = {
@@ -152,9 +226,15 @@ class NeteaseSpider(BaseMusicSpider):
                 'play_count': song_info.get('playCount', 0),
             }
             
-            song = self.save_song(song_data, artist, album)
-            return song is not None
+            return {'artist': artist_data, 'album': album_data, 'song': song_data}
             
         except Exception as e:
             self.log('ERROR', f'解析歌曲信息失败: {str(e)}')
-            return False
\ No newline at end of file
+            return None
+    
+    def parse_and_save_song(self, song_info):
+        """解析并逐条保存歌曲信息"""
+        item = self.parse_song(song_info)
+        if not item:
+            return False
+        return self._save_item(item)
\ No newline at end of file
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from crawler.models import CrawlTask
+
+STATISTICS_VERSION_KEY = 'crawler:statistics:version'
+
+
+def invalidate_statistics():
+    """任务状态变化后使统计缓存失效"""
+    try:
+        cache.incr(STATISTICS_VERSION_KEY)
+    except ValueError:
+        cache.set(STATISTICS_VERSION_KEY, 1, None)
+
+
+def task_statistics(since=None):
+    """按状态、平台、任务类型统计任务数量，since 为创建时间下限
+
+    只执行一次分组聚合查询，结果缓存 CRAWLER_STATISTICS_CACHE_TIMEOUT 秒。
+    since 截断到分钟，days=N 这类相对时间在同一分钟内能命中同一个缓存键。
+    """
+    if since is not None:
+        since = since.replace(second=0, microsecond=0)
+    version = cache.get(STATISTICS_VERSION_KEY, 0)
+    cache_key = f'crawler:statistics:{version}:{since.isoformat() if since else "all"}'
+    stats = cache.get(cache_key)
+    if stats is not None:
+        return stats
+
+    queryset = CrawlTask.objects.all()
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    rows = (
+        queryset.order_by()
+        .values('status', 'platform__name', 'task_type')
+        .annotate(count=Count('id'))
+    )
+
+    stats = {'total': 0}
+    stats.update({status: 0 for status, _ in CrawlTask.STATUS_CHOICES})
+    by_platform = {}
+    by_task_type = {task_type: 0 for task_type, _ in CrawlTask.TYPE_CHOICES}
+    for row in rows:
+        stats['total'] += row['count']
+        stats[row['status']] = stats.get(row['status'], 0) + row['count']
+        by_platform[row['platform__name']] = by_platform.get(row['platform__name'], 0) + row['count']
+        by_task_type[row['task_type']] = by_task_type.get(row['task_type'], 0) + row['count']
+    stats['by_platform'] = by_platform
+    stats['by_task_type'] = by_task_type
+
+    cache.set(cache_key, stats, settings.CRAWLER_STATISTICS_CACHE_TIMEOUT)
+    return stats
@@ -1,20 +1,37 @@
-from celery import shared_task
+from celery import shared_task, chord
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Least
 from django.utils import timezone
 from .models import CrawlTask, CrawlLog
 from .spiders.base import get_spider_by_platform
+from .progress import PROGRESS_FIELDS, RESULT_FIELDS, publish_progress
+from .statistics import invalidate_statistics
 import logging
 
 logger = logging.getLogger('crawler')
 
 
+class ShardIncomplete(Exception):
+    """分片有页面获取失败或爬虫内部出错，需要重试"""
+
+
 @shared_task
 def start_crawl_task(task_id):
     """启动爬虫任务"""
+    spider = None
     try:
         task = CrawlTask.objects.get(id=task_id)
         task.status = 'running'
         task.started_at = timezone.now()
-        task.save()
+        # 排队期间已被取消的任务不再执行
+        started = CrawlTask.objects.filter(id=task_id).exclude(status='cancelled').update(
+            status=task.status, started_at=task.started_at, updated_at=task.started_at
+        )
+        if not started:
+            logger.info(f'爬虫任务已取消，跳过执行 {task_id}')
+            return
+        invalidate_statistics()
         
         # 记录日志
         CrawlLog.objects.create(
@@ -28,32 +45,56 @@ def start_crawl_task(task_id):
         if not spider_class:
             raise Exception(f'不支持的平台: {task.platform.name}')
         
+        # 页数较多时拆分为多个分片，由多个Worker并行执行
+        shards = plan_shards(task, spider_class)
+        if len(shards) > 1:
+            dispatch_shards(task, shards)
+            return
+        
         # 初始化爬虫
         spider = spider_class(task)
         
         # 执行爬虫
         result = spider.crawl()
         
-        # 更新任务状态
-        task.status = 'completed'
+        # 更新任务状态，任务在运行中被取消时保留取消状态和已保存的部分结果
+        cancelled = spider.is_cancelled()
         task.completed_at = timezone.now()
-        task.progress = 100
-        task.total_found = result.get('found', 0)
-        task.total_saved = result.get('saved', 0)
-        task.total_failed = result.get('failed', 0)
-        task.save()
+        if not cancelled:
+            task.progress = 100
+        for key, field in RESULT_FIELDS.items():
+            setattr(task, field, result.get(key, 0))
+        task.save(update_fields=['completed_at', 'updated_at'] + PROGRESS_FIELDS)
         
+        if not cancelled:
+            cancelled = not CrawlTask.objects.filter(id=task.id, status='running').update(status='completed')
+        task.status = 'cancelled' if cancelled else 'completed'
+        publish_progress(task)
+        invalidate_statistics()
+        
+        # 先写入爬虫缓冲中的日志和运行统计，完成日志排在任务日志的最后
+        spider.close()
+        spider = None
+        summary = task_summary(task)
         CrawlLog.objects.create(
             task=task,
             level='INFO',
-            message=f'任务完成: 发现{task.total_found}项，保存{task.total_saved}项，失败{task.total_failed}项'
+            message=f'任务已取消: {summary}' if cancelled else f'任务完成: {summary}'
         )
         
     except Exception as e:
-        # 更新任务状态为失败
-        task.status = 'failed'
+        # 先写入爬虫缓冲中的日志，保证错误记录不丢失且排在失败日志之前
+        if spider is not None:
+            spider.close()
+            spider = None
+        
+        # 更新任务状态为失败(已取消的任务保留取消状态)
         task.completed_at = timezone.now()
-        task.save()
+        task.save(update_fields=['completed_at', 'updated_at'])
+        CrawlTask.objects.filter(id=task.id).exclude(status='cancelled').update(status='failed')
+        task.refresh_from_db(fields=['status'])
+        publish_progress(task)
+        invalidate_statistics()
         
         CrawlLog.objects.create(
             task=task,
@@ -62,4 +103,145 @@ def start_crawl_task(task_id):
         )
         
         logger.error(f'爬虫任务失败 {task_id}: {str(e)}')
-        raise
\ No newline at end of file
+        raise
+        
+    finally:
+        if spider is not None:
+            spider.close()
+
+
+def submit_crawl_task(task):
+    """提交任务到Celery队列，歌词补全任务使用 CRAWLER_LYRICS_QUEUE"""
+    options = {}
+    if task.task_type == 'lyrics':
+        options['queue'] = settings.CRAWLER_LYRICS_QUEUE
+    start_crawl_task.apply_async((task.id,), **options)
+
+
+def task_summary(task):
+    """任务统计摘要"""
+    return (f'发现{task.total_found}项，保存{task.total_saved}项(新增{task.total_created}项，'
+            f'更新{task.total_updated}项)，未变化{task.total_unchanged}项，失败{task.total_failed}项')
+
+
+def plan_shards(task, spider_class):
+    """按 CRAWLER_SHARD_PAGES 将任务的页码拆分为 [(起始页, 结束页)]"""
+    shard_pages = settings.CRAWLER_SHARD_PAGES
+    # 增量任务需要按页序判断何时停止翻页，不拆分
+    if (not spider_class.supports_sharding or task.task_type != 'search' or task.incremental
+            or shard_pages <= 0 or task.max_pages <= shard_pages):
+        return [(1, task.max_pages)]
+    
+    return [
+        (first_page, min(first_page + shard_pages - 1, task.max_pages))
+        for first_page in range(1, task.max_pages + 1, shard_pages)
+    ]
+
+
+def dispatch_shards(task, shards):
+    """以chord方式分发分片，全部完成后汇总任务状态"""
+    task.progress = 0
+    for field in RESULT_FIELDS.values():
+        setattr(task, field, 0)
+    task.save(update_fields=['progress', *RESULT_FIELDS.values(), 'updated_at'])
+    publish_progress(task)
+    
+    CrawlLog.objects.create(
+        task=task,
+        level='INFO',
+        message=f'任务拆分为{len(shards)}个分片并行执行'
+    )
+    
+    header = [crawl_task_shard.s(task.id, first_page, last_page) for first_page, last_page in shards]
+    callback = finish_sharded_task.s(task.id).on_error(fail_sharded_task.s(task.id))
+    chord(header)(callback)
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True,
+             max_retries=settings.CRAWLER_SHARD_MAX_RETRIES)
+def crawl_task_shard(self, task_id, first_page, last_page):
+    """执行单个分片: 爬取 [first_page, last_page] 页，成功后原子累加到任务统计
+    
+    有页面获取/解析失败或爬虫内部出错时只重试该分片，重试前不累加统计；
+    保存使用upsert，重试不会产生重复数据。重试用尽后按部分结果累加，
+    失败数计入任务统计。单条数据解析失败只计数，不重试。
+    """
+    task = CrawlTask.objects.select_related('platform').get(id=task_id)
+    if task.status == 'cancelled':
+        return {'found': 0, 'saved': 0, 'failed': 0}
+    spider_class = get_spider_by_platform(task.platform.name)
+    
+    spider = spider_class(task)
+    spider.page_range = (first_page, last_page)
+    cache_hits, cache_misses = task.cache_hits, task.cache_misses
+    try:
+        result = spider.crawl()
+    finally:
+        spider.close()
+    
+    problem = result.get('error') or (
+        f'{result["failed_pages"]}页获取或解析失败' if result.get('failed_pages') else None
+    )
+    if problem and not spider.is_cancelled():
+        if self.request.retries < self.max_retries:
+            raise ShardIncomplete(f'分片 [{first_page}, {last_page}] 未完成: {problem}')
+        CrawlLog.objects.create(
+            task=task,
+            level='WARNING',
+            message=f'分片 [{first_page}, {last_page}] 重试{self.request.retries}次后仍未完成({problem})，按部分结果记录'
+        )
+    
+    shard_progress = (last_page - first_page + 1) * 100 // task.max_pages
+    CrawlTask.objects.filter(id=task_id).update(
+        **{field: F(field) + result.get(key, 0) for key, field in RESULT_FIELDS.items()},
+        cache_hits=F('cache_hits') + (task.cache_hits - cache_hits),
+        cache_misses=F('cache_misses') + (task.cache_misses - cache_misses),
+        # 全部分片完成前进度不超过99，由汇总任务置为100
+        progress=Least(F('progress') + shard_progress, 99),
+        updated_at=timezone.now()
+    )
+    task.refresh_from_db(fields=['status'] + PROGRESS_FIELDS)
+    publish_progress(task)
+    return result
+
+
+@shared_task
+def finish_sharded_task(results, task_id):
+    """所有分片完成后将任务标记为完成，已取消的任务保留取消状态"""
+    completed = CrawlTask.objects.filter(id=task_id, status='running').update(
+        status='completed',
+        completed_at=timezone.now(),
+        progress=100,
+        updated_at=timezone.now()
+    )
+    if not completed:
+        CrawlTask.objects.filter(id=task_id).update(completed_at=timezone.now())
+    task = CrawlTask.objects.get(id=task_id)
+    publish_progress(task)
+    invalidate_statistics()
+    
+    summary = task_summary(task)
+    CrawlLog.objects.create(
+        task=task,
+        level='INFO',
+        message=f'任务完成({len(results)}个分片): {summary}' if completed else f'任务已取消: {summary}'
+    )
+
+
+@shared_task
+def fail_sharded_task(request, exc, traceback, task_id):
+    """分片重试用尽后将任务标记为失败"""
+    CrawlTask.objects.filter(id=task_id).exclude(status='cancelled').update(
+        status='failed',
+        completed_at=timezone.now(),
+        updated_at=timezone.now()
+    )
+    invalidate_statistics()
+    
+    CrawlLog.objects.create(
+        task_id=task_id,
+        level='ERROR',
+        message=f'分片执行失败: {str(exc)}'
+    )
+    
+    logger.error(f'爬虫任务分片失败 {task_id}: {str(exc)}')
@@ -1,10 +1,22 @@
+from datetime import timedelta
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import CrawlTask, CrawlLog
-from .serializers import CrawlTaskSerializer, CreateCrawlTaskSerializer, CrawlLogSerializer
-from .tasks import start_crawl_task
+from .serializers import (
+    CrawlTaskSerializer, CrawlTaskListSerializer, CrawlTaskDetailSerializer,
+    CreateCrawlTaskSerializer, CrawlLogSerializer
+)
+from .pagination import CrawlLogCursorPagination
+from .tasks import submit_crawl_task
+from .progress import get_published_progress, progress_snapshot, publish_progress
+from .cancellation import request_cancel
+from .statistics import task_statistics, invalidate_statistics
 
 
 class CrawlTaskViewSet(viewsets.ModelViewSet):
@@ -17,23 +29,49 @@ class CrawlTaskViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'updated_at', 'started_at']
     ordering = ['-created_at']
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        
+        # 日志数量和最后一条错误用子查询取得，避免加载全部日志
+        task_logs = CrawlLog.objects.filter(task=OuterRef('pk')).order_by()
+        log_count = task_logs.values('task').annotate(count=Count('id')).values('count')
+        last_error = task_logs.filter(level='ERROR').order_by('-id').values('message')[:1]
+        queryset = queryset.annotate(
+            log_count=Coalesce(Subquery(log_count, output_field=IntegerField()), 0),
+            last_error=Subquery(last_error)
+        )
+        if self.expand_logs():
+            queryset = queryset.prefetch_related('logs')
+        return queryset
+    
+    def expand_logs(self):
+        """是否显式要求返回全部日志 (?expand=logs)"""
+        return 'logs' in self.request.query_params.get('expand', '').split(',')
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return CreateCrawlTaskSerializer
+        if self.action in ('list', 'retrieve') and self.expand_logs():
+            return CrawlTaskDetailSerializer
+        if self.action == 'list':
+            return CrawlTaskListSerializer
         return CrawlTaskSerializer
     
     def perform_create(self, serializer):
         """创建任务时自动启动"""
         task = serializer.save()
+        invalidate_statistics()
         # 启动异步爬虫任务
-        start_crawl_task.delay(task.id)
+        submit_crawl_task(task)
     
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
         """手动启动任务"""
         task = self.get_object()
         if task.status == 'pending':
-            start_crawl_task.delay(task.id)
+            submit_crawl_task(task)
             return Response({'message': '任务已启动'})
         else:
             return Response({'error': '任务状态不允许启动'}, 
@@ -45,24 +83,66 @@ class CrawlTaskViewSet(viewsets.ModelViewSet):
         task = self.get_object()
         if task.status in ['pending', 'running']:
             task.status = 'cancelled'
-            task.save()
+            task.save(update_fields=['status', 'updated_at'])
+            # 覆盖缓存中的进度，否则进度接口在爬虫停止前仍返回运行中
+            publish_progress(task)
+            # 通知运行中的爬虫尽快停止
+            request_cancel(task.id)
+            invalidate_statistics()
             return Response({'message': '任务已取消'})
         else:
             return Response({'error': '任务状态不允许取消'}, 
                           status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """获取任务进度，优先读取爬虫发布到缓存的进度"""
+        data = get_published_progress(pk)
+        if data is None:
+            data = progress_snapshot(self.get_object())
+        return Response(data)
+    
+    @action(detail=True, methods=['get'], serializer_class=CrawlLogSerializer,
+            pagination_class=CrawlLogCursorPagination)
+    def logs(self, request, pk=None):
+        """分页获取任务日志，可用 level=ERROR,WARNING 按级别过滤"""
+        task = self.get_object()
+        logs = CrawlLog.objects.filter(task=task)
+        levels = [level.strip().upper() for level in request.query_params.get('level', '').split(',') if level.strip()]
+        if levels:
+            logs = logs.filter(level__in=levels)
+        
+        page = self.paginate_queryset(logs)
+        serializer = CrawlLogSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_statistics()
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """获取统计信息"""
-        stats = {
-            'total': self.queryset.count(),
-            'pending': self.queryset.filter(status='pending').count(),
-            'running': self.queryset.filter(status='running').count(),
-            'completed': self.queryset.filter(status='completed').count(),
-            'failed': self.queryset.filter(status='failed').count(),
-            'cancelled': self.queryset.filter(status='cancelled').count(),
-        }
-        return Response(stats)
+        """获取统计信息，可用 days=7 或 since=ISO时间 限定创建时间范围"""
+        since = None
+        if request.query_params.get('days'):
+            try:
+                since = timezone.now() - timedelta(days=int(request.query_params['days']))
+            except ValueError:
+                return Response({'error': 'days 必须为整数'}, status=status.HTTP_400_BAD_REQUEST)
+            except OverflowError:
+                return Response({'error': 'days 超出范围'}, status=status.HTTP_400_BAD_REQUEST)
+        elif request.query_params.get('since'):
+            try:
+                # 格式正确但日期不存在(如13月)时 parse_datetime 抛出 ValueError
+                since = parse_datetime(request.query_params['since'])
+            except ValueError:
+                since = None
+            if since is None:
+                return Response({'error': 'since 不是有效的时间'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        
+        return Response(task_statistics(since))
 
 
 class CrawlLogViewSet(viewsets.ReadOnlyModelViewSet):
@@ -0,0 +1,283 @@
+import json
+import hashlib
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from music.models import Song, Artist, Album
+
+
+def field_changed(field, value, stored):
+    """抓取值与已保存的值是否不同，先按字段类型转换(如 '180' 与 180 视为相同)"""
+    try:
+        value = field.to_python(value)
+    except ValidationError:
+        return True
+    return value != stored
+
+
+def apply_changes(instance, values):
+    """把抓取值赋给已保存的实例，返回有变化的字段名列表"""
+    changed = []
+    for name, value in values.items():
+        field = instance._meta.get_field(name)
+        if field_changed(field, value, getattr(instance, name)):
+            setattr(instance, name, value)
+            changed.append(name)
+    return changed
+
+
+class CatalogWriter:
+    """按 (platform, platform_id) 批量upsert艺术家、专辑和歌曲
+
+    爬虫保存整页结果和 import_catalog 导入离线数据共用这套写入逻辑。
+    identity_map 为可选的 crawler.identity.IdentityMap，用于跳过未变化的艺术家和专辑。
+    """
+    
+    # 批量upsert时各模型的更新字段: (必更新字段, 仅在数据中提供时才更新的字段)
+    ARTIST_UPDATE_FIELDS = (('name',), ('biography', 'platform_url'))
+    ALBUM_UPDATE_FIELDS = (('title',), ('description', 'platform_url'))
+    SONG_UPDATE_FIELDS = (('title', 'content_hash'), ('duration', 'lyrics', 'genre', 'platform_url',
+                                       'audio_url', 'play_count', 'like_count'))
+    
+    # 播放、点赞等计数每次抓取都可能变化，不计入内容指纹
+    VOLATILE_SONG_FIELDS = ('play_count', 'like_count')
+    
+    # 条目各部分的必需字段(值不能为空)
+    REQUIRED_FIELDS = {
+        'artist': ('platform_id', 'name'),
+        'album': ('platform_id', 'title'),
+        'song': ('platform_id', 'title'),
+    }
+    
+    def __init__(self, platform, identity_map=None, batch_size=500):
+        self.platform = platform
+        self.identity_map = identity_map
+        self.batch_size = batch_size
+    
+    @classmethod
+    def is_valid_item(cls, item):
+        """检查条目结构和必需字段，专辑可以为None
+        
+        离线导入的数据未经爬虫解析，不合格的行若进入批量写入会使整批回滚，
+        因此在这里过滤掉。
+        """
+        if not isinstance(item, dict):
+            return False
+        for part, fields in cls.REQUIRED_FIELDS.items():
+            data = item.get(part)
+            if part == 'album' and data is None:
+                continue
+            if not isinstance(data, dict):
+                return False
+            for field in fields:
+                value = data.get(field)
+                if not value or not isinstance(value, (str, int)):
+                    return False
+        return True
+    
+    @classmethod
+    def content_hash(cls, item):
+        """计算条目(艺术家、专辑和歌曲)抓取内容的指纹"""
+        song_data = {
+            name: value for name, value in item['song'].items()
+            if name not in cls.VOLATILE_SONG_FIELDS
+        }
+        content = {'artist': item['artist'], 'album': item.get('album'), 'song': song_data}
+        raw = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+    
+    def drop_unchanged(self, items):
+        """去掉内容指纹与已保存歌曲一致的条目，返回 (需要写入的条目, 未变化数)"""
+        hashes = {item['song']['platform_id']: self.content_hash(item) for item in items}
+        stored = dict(
+            Song.objects.filter(platform=self.platform, platform_id__in=list(hashes))
+            .exclude(content_hash='')
+            .values_list('platform_id', 'content_hash')
+        )
+        changed = [
+            item for item in items
+            if stored.get(item['song']['platform_id']) != hashes[item['song']['platform_id']]
+        ]
+        return changed, len(items) - len(changed)
+    
+    def write(self, items):
+        """批量写入艺术家、专辑和歌曲，返回歌曲的 (新增数, 更新数, 未变化数, 主键列表)
+        
+        items 形如 {'artist': ..., 'album': ... 或 None, 'song': ...}，
+        需由调用方包在事务中。主键列表包含新增和更新的歌曲，以及艺术家名或专辑标题
+        有变化的已有歌曲(其全文索引和去重指纹随之变化，需要调用方一并更新)。
+        """
+        artists = {}
+        for item in items:
+            artists.setdefault(item['artist']['platform_id'], item['artist'])
+        artist_ids = self._resolve_known(Artist, artists)
+        renamed_artists = []
+        pending = {
+            platform_id: Artist(
+                platform=self.platform,
+                platform_id=platform_id,
+                name=artist_data['name'],
+                biography=artist_data.get('biography', ''),
+                platform_url=artist_data.get('platform_url', ''),
+            )
+            for platform_id, artist_data in artists.items()
+            if platform_id not in artist_ids
+        }
+        if pending:
+            pk_map, _, _, changed = self._bulk_upsert(Artist, pending, self.ARTIST_UPDATE_FIELDS, artists)
+            self._remember(Artist, artists, pk_map)
+            renamed_artists = [pk_map[platform_id] for platform_id, fields in changed.items() if 'name' in fields]
+            artist_ids.update(pk_map)
+        
+        albums = {}
+        album_artists = {}
+        for item in items:
+            album_data = item.get('album')
+            if album_data and album_data['platform_id'] not in albums:
+                albums[album_data['platform_id']] = album_data
+                album_artists[album_data['platform_id']] = item['artist']['platform_id']
+        album_ids = self._resolve_known(Album, albums)
+        renamed_albums = []
+        pending = {
+            platform_id: Album(
+                platform=self.platform,
+                platform_id=platform_id,
+                title=album_data['title'],
+                artist_id=artist_ids[album_artists[platform_id]],
+                description=album_data.get('description', ''),
+                platform_url=album_data.get('platform_url', ''),
+                release_date=album_data.get('release_date'),
+            )
+            for platform_id, album_data in albums.items()
+            if platform_id not in album_ids
+        }
+        if pending:
+            pk_map, _, _, changed = self._bulk_upsert(Album, pending, self.ALBUM_UPDATE_FIELDS, albums)
+            self._remember(Album, albums, pk_map)
+            renamed_albums = [pk_map[platform_id] for platform_id, fields in changed.items() if 'title' in fields]
+            album_ids.update(pk_map)
+        
+        songs = {}
+        song_data_by_id = {}
+        for item in items:
+            song_data = item['song']
+            song_data_by_id[song_data['platform_id']] = song_data
+            album_data = item.get('album')
+            songs[song_data['platform_id']] = Song(
+                platform=self.platform,
+                platform_id=song_data['platform_id'],
+                title=song_data['title'],
+                artist_id=artist_ids[item['artist']['platform_id']],
+                album_id=album_ids.get(album_data['platform_id']) if album_data else None,
+                duration=song_data.get('duration'),
+                lyrics=song_data.get('lyrics', ''),
+                genre=song_data.get('genre', ''),
+                platform_url=song_data.get('platform_url', ''),
+                audio_url=song_data.get('audio_url', ''),
+                play_count=song_data.get('play_count', 0),
+                like_count=song_data.get('like_count', 0),
+                content_hash=self.content_hash(item),
+            )
+        pk_map, existing, unchanged, _ = self._bulk_upsert(Song, songs, self.SONG_UPDATE_FIELDS,
+                                                           song_data_by_id)
+        
+        # 同一页内重复出现的歌曲只计一次
+        created = len(songs) - len(existing)
+        updated = len(existing) - len(unchanged)
+        song_ids = [pk for platform_id, pk in pk_map.items() if platform_id not in unchanged]
+        if renamed_artists or renamed_albums:
+            # 批量UPDATE不触发信号，改名的艺术家、专辑下其他歌曲也要重建索引
+            song_ids.extend(
+                Song.objects.filter(Q(artist_id__in=renamed_artists) | Q(album_id__in=renamed_albums))
+                .exclude(pk__in=song_ids).values_list('pk', flat=True)
+            )
+        return created, updated, len(unchanged), song_ids
+    
+    def _resolve_known(self, model, data_by_id):
+        """从映射中取出已知且数据未变化的主键，返回 {platform_id: pk}"""
+        known = {}
+        if self.identity_map is None:
+            return known
+        for platform_id, data in data_by_id.items():
+            key = self.identity_map.key(model, self.platform, platform_id)
+            pk = self.identity_map.lookup(key, data)
+            if pk:
+                known[platform_id] = pk
+        return known
+    
+    def _remember(self, model, data_by_id, pk_map):
+        """将写入后的主键记录到映射中"""
+        if self.identity_map is None:
+            return
+        for platform_id, pk in pk_map.items():
+            key = self.identity_map.key(model, self.platform, platform_id)
+            self.identity_map.put(key, pk, data_by_id[platform_id])
+    
+    def _bulk_upsert(self, model, objs, update_fields, data_by_id):
+        """按 (platform, platform_id) 对一组对象做upsert，只写入有变化的行
+        
+        objs 为 {platform_id: 未保存的模型实例}，data_by_id 为对应的原始数据，
+        用于判断可选字段是否出现(与逐条保存一致: 数据中未提供的可选字段不覆盖已有值)。
+        已存在的行逐字段与抓取值比较，完全一致的不写入，也不更新 updated_at；
+        其余按变化的列分组批量UPDATE。
+        返回 ({platform_id: pk}, 已存在的platform_id集合, 未变化的platform_id集合,
+        {platform_id: 有变化的字段名})。
+        """
+        required, optional = update_fields
+        stored = {
+            row['platform_id']: row
+            for row in model.objects.filter(platform=self.platform, platform_id__in=list(objs))
+            .values('pk', 'platform_id', *required, *optional)
+        }
+        
+        pk_map = {}
+        unchanged = set()
+        changes = {}
+        changed_by_id = {}
+        for platform_id, obj in objs.items():
+            row = stored.get(platform_id)
+            if row is None:
+                continue
+            pk_map[platform_id] = obj.pk = row['pk']
+            data = data_by_id[platform_id]
+            changed = tuple(
+                name for name in required + tuple(name for name in optional if name in data)
+                if field_changed(model._meta.get_field(name), getattr(obj, name), row[name])
+            )
+            if changed:
+                changes.setdefault(changed, []).append(obj)
+                changed_by_id[platform_id] = changed
+            else:
+                unchanged.add(platform_id)
+        
+        now = timezone.now()
+        for changed, group in changes.items():
+            for obj in group:
+                obj.updated_at = now
+            model.objects.bulk_update(group, list(changed) + ['updated_at'], batch_size=self.batch_size)
+        
+        new_objs = {platform_id: obj for platform_id, obj in objs.items() if platform_id not in stored}
+        if new_objs:
+            # 并发写入时其他进程可能已插入同一行，冲突时按upsert处理
+            fields = list(required) + [
+                name for name in optional
+                if all(name in data_by_id[platform_id] for platform_id in new_objs)
+            ] + ['updated_at']
+            
+            conflict_target = {}
+            if connection.features.supports_update_conflicts_with_target:
+                conflict_target['unique_fields'] = ['platform', 'platform_id']
+            
+            model.objects.bulk_create(
+                list(new_objs.values()),
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                update_fields=fields,
+                **conflict_target
+            )
+            pk_map.update(
+                model.objects.filter(platform=self.platform, platform_id__in=list(new_objs))
+                .values_list('platform_id', 'pk')
+            )
+        return pk_map, set(stored), unchanged, changed_by_id
\ No newline at end of file
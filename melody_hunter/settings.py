@@ -161,10 +161,44 @@ REST_FRAMEWORK = {
     ],
 }
 
+# 歌曲全文索引(SQLite FTS5)，Web和Worker需能访问同一文件
+MUSIC_SEARCH_INDEX_PATH = os.getenv('MUSIC_SEARCH_INDEX_PATH', str(BASE_DIR / 'cache' / 'song_search.sqlite3'))
+# 单次检索返回的最大结果数: 有 search 参数时只在相关度最高的这些歌曲中过滤、排序和分页
+MUSIC_SEARCH_MAX_RESULTS = int(os.getenv('MUSIC_SEARCH_MAX_RESULTS', '1000'))
+
+# 热门歌曲榜单: 每个榜单展示的最大歌曲数，redis 后端在Web和Worker间共享
+MUSIC_LEADERBOARD_SIZE = int(os.getenv('MUSIC_LEADERBOARD_SIZE', '100'))
+MUSIC_LEADERBOARD_BACKEND = os.getenv('MUSIC_LEADERBOARD_BACKEND', 'redis')
+MUSIC_LEADERBOARD_REDIS_URL = os.getenv('MUSIC_LEADERBOARD_REDIS_URL', os.getenv('CACHE_URL', 'redis://localhost:6379/1'))
+
+# 播放计数: 累计在Redis中，由定时任务按间隔(秒)批量写库
+MUSIC_PLAY_COUNTER_REDIS_URL = os.getenv('MUSIC_PLAY_COUNTER_REDIS_URL', os.getenv('CACHE_URL', 'redis://localhost:6379/1'))
+MUSIC_PLAY_COUNTER_FLUSH_INTERVAL = float(os.getenv('MUSIC_PLAY_COUNTER_FLUSH_INTERVAL', '10'))
+MUSIC_PLAY_COUNTER_BATCH_SIZE = int(os.getenv('MUSIC_PLAY_COUNTER_BATCH_SIZE', '500'))
+
+# 目录导出时每次按主键分块读取的行数
+MUSIC_EXPORT_CHUNK_SIZE = int(os.getenv('MUSIC_EXPORT_CHUNK_SIZE', '2000'))
+
+# 曲库接口(列表、详情、搜索、热门)响应缓存时间(秒)，0 表示关闭；数据写入时按平台失效
+MUSIC_RESPONSE_CACHE_TIMEOUT = int(os.getenv('MUSIC_RESPONSE_CACHE_TIMEOUT', '300'))
+
+# 跨平台歌曲去重: 保存时增量归并作品，时长相差不超过容差(秒)视为同一首
+MUSIC_DEDUP_ON_SAVE = os.getenv('MUSIC_DEDUP_ON_SAVE', 'True').lower() == 'true'
+MUSIC_DEDUP_DURATION_TOLERANCE = int(os.getenv('MUSIC_DEDUP_DURATION_TOLERANCE', '3'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
+# Cache (Worker和Web进程共享)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_URL', 'redis://localhost:6379/1'),
+        'KEY_PREFIX': 'melody_hunter',
+    }
+}
+
 # Celery settings
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -172,6 +206,52 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'flush-play-counts': {
+        'task': 'music.tasks.flush_play_counts',
+        'schedule': MUSIC_PLAY_COUNTER_FLUSH_INTERVAL,
+    },
+}
+
+# 爬虫配置
+# 单个爬虫实例内 (platform, platform_id) -> 主键 映射的最大条目数
+CRAWLER_IDENTITY_MAP_SIZE = int(os.getenv('CRAWLER_IDENTITY_MAP_SIZE', '10000'))
+# 是否在同一Worker进程的多个任务之间共享映射
+CRAWLER_SHARED_IDENTITY_MAP = os.getenv('CRAWLER_SHARED_IDENTITY_MAP', 'False').lower() == 'true'
+CRAWLER_SHARED_IDENTITY_MAP_SIZE = int(os.getenv('CRAWLER_SHARED_IDENTITY_MAP_SIZE', '100000'))
+# 单个任务并发请求数的上限
+CRAWLER_MAX_CONCURRENCY = int(os.getenv('CRAWLER_MAX_CONCURRENCY', '8'))
+# 平台限流器后端: redis 为多Worker共享，local 为进程内(测试用)
+CRAWLER_RATE_LIMIT_BACKEND = os.getenv('CRAWLER_RATE_LIMIT_BACKEND', 'redis')
+CRAWLER_RATE_LIMIT_REDIS_URL = os.getenv('CRAWLER_RATE_LIMIT_REDIS_URL', CELERY_BROKER_URL)
+# HTTP响应缓存(任务开启 use_http_cache 时使用)，有效期按平台配置
+CRAWLER_HTTP_CACHE_PATH = os.getenv('CRAWLER_HTTP_CACHE_PATH', str(BASE_DIR / 'cache' / 'http_cache.sqlite3'))
+CRAWLER_HTTP_CACHE_MAX_BYTES = int(os.getenv('CRAWLER_HTTP_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# 请求重试: 最大重试次数和指数退避的基数/上限(秒)
+CRAWLER_RETRY_MAX_ATTEMPTS = int(os.getenv('CRAWLER_RETRY_MAX_ATTEMPTS', '3'))
+CRAWLER_RETRY_BACKOFF_BASE = float(os.getenv('CRAWLER_RETRY_BACKOFF_BASE', '1'))
+CRAWLER_RETRY_BACKOFF_MAX = float(os.getenv('CRAWLER_RETRY_BACKOFF_MAX', '30'))
+# 平台熔断: 连续失败次数阈值和熔断后进入半开探测前的等待秒数
+CRAWLER_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CRAWLER_CIRCUIT_FAILURE_THRESHOLD', '5'))
+CRAWLER_CIRCUIT_RESET_TIMEOUT = float(os.getenv('CRAWLER_CIRCUIT_RESET_TIMEOUT', '60'))
+# 任务分片: 搜索任务页数超过该值时按此页数拆分为多个Celery子任务并行执行，0表示不拆分
+CRAWLER_SHARD_PAGES = int(os.getenv('CRAWLER_SHARD_PAGES', '10'))
+CRAWLER_SHARD_MAX_RETRIES = int(os.getenv('CRAWLER_SHARD_MAX_RETRIES', '3'))
+# 歌词补全: 每批歌曲数、歌词过期天数，以及任务使用的Celery队列(由单独的Worker消费，不占用爬取Worker，见README)
+CRAWLER_LYRICS_BATCH_SIZE = int(os.getenv('CRAWLER_LYRICS_BATCH_SIZE', '200'))
+CRAWLER_LYRICS_TTL_DAYS = int(os.getenv('CRAWLER_LYRICS_TTL_DAYS', '90'))
+CRAWLER_LYRICS_QUEUE = os.getenv('CRAWLER_LYRICS_QUEUE', 'lyrics')
+# 任务进度: 最短写库间隔(秒)和发布到缓存的过期时间
+CRAWLER_PROGRESS_INTERVAL = float(os.getenv('CRAWLER_PROGRESS_INTERVAL', '2'))
+CRAWLER_PROGRESS_CACHE_TIMEOUT = int(os.getenv('CRAWLER_PROGRESS_CACHE_TIMEOUT', '86400'))
+# 任务取消检查: 两次读取取消标记的最短间隔和回退查询数据库的间隔(秒)
+CRAWLER_CANCEL_CHECK_INTERVAL = float(os.getenv('CRAWLER_CANCEL_CHECK_INTERVAL', '1'))
+CRAWLER_CANCEL_DB_CHECK_INTERVAL = float(os.getenv('CRAWLER_CANCEL_DB_CHECK_INTERVAL', '10'))
+# 任务统计接口的缓存时间(秒)，任务状态变化时立即失效
+CRAWLER_STATISTICS_CACHE_TIMEOUT = int(os.getenv('CRAWLER_STATISTICS_CACHE_TIMEOUT', '30'))
+# 爬虫日志缓冲: 攒够条数或超过间隔秒数时批量写入数据库
+CRAWLER_LOG_BUFFER_SIZE = int(os.getenv('CRAWLER_LOG_BUFFER_SIZE', '100'))
+CRAWLER_LOG_FLUSH_INTERVAL = float(os.getenv('CRAWLER_LOG_FLUSH_INTERVAL', '5'))
 
 # Logging
 LOGGING = {
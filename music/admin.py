@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Song, Artist, Album, Platform
+from .models import Song, Artist, Album, Platform, Work
 
 
 @admin.register(Artist)
@@ -26,6 +26,13 @@ class SongAdmin(admin.ModelAdmin):
 
 @admin.register(Platform)
 class PlatformAdmin(admin.ModelAdmin):
-    list_display = ['name', 'base_url', 'is_active', 'created_at']
+    list_display = ['name', 'base_url', 'is_active', 'rate_limit', 'rate_burst', 'cache_ttl', 'created_at']
     list_filter = ['is_active', 'created_at']
-    search_fields = ['name']
\ No newline at end of file
+    search_fields = ['name']
+
+
+@admin.register(Work)
+class WorkAdmin(admin.ModelAdmin):
+    list_display = ['title', 'artist_name', 'duration', 'created_at']
+    search_fields = ['title', 'artist_name']
+    raw_id_fields = ['canonical_song']
\ No newline at end of file
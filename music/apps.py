@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class MusicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'music'
-    verbose_name = '音乐管理'
\ No newline at end of file
+    verbose_name = '音乐管理'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,189 @@
+import logging
+import threading
+import uuid
+from datetime import timedelta
+import redis
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Case, When, Value, IntegerField
+from django.utils import timezone
+from .models import Song, PlayCountFlush
+from .responsecache import invalidate_platforms
+
+logger = logging.getLogger('django')
+
+# 释放锁时只删除自己持有的锁
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisPlayCounter:
+    """基于Redis哈希的计数器，所有Web进程共享
+
+    写库前把计数哈希原子改名为带唯一编号的批次，批次编号与增量在同一个
+    数据库事务中写入 PlayCountFlush，同一批次重复写库(中断后重试、并发执行)
+    会因唯一约束失败而跳过，不会重复累加。
+    """
+
+    key = 'melody_hunter:play_counts'
+    batches_key = 'melody_hunter:play_counts:batches'
+    batch_key_prefix = 'melody_hunter:play_counts:batch:'
+    lock_key = 'melody_hunter:play_counts:lock'
+    lock_timeout = 60 * 1000
+
+    def __init__(self, client):
+        self.client = client
+
+    def batch_key(self, flush_id):
+        return f'{self.batch_key_prefix}{flush_id}'
+
+    def flush_ids(self):
+        """尚未确认写库的批次编号"""
+        return sorted(flush_id.decode() for flush_id in self.client.smembers(self.batches_key))
+
+    def incr(self, pk, amount=1):
+        """累加播放次数，返回该歌曲尚未写库的增量"""
+        self.client.hincrby(self.key, pk, amount)
+        return self.pending([pk]).get(pk, 0)
+
+    def pending(self, pks):
+        """查询尚未写库的增量(包括正在写库的批次)"""
+        if not pks:
+            return {}
+        pipe = self.client.pipeline()
+        pipe.hmget(self.key, pks)
+        for flush_id in self.flush_ids():
+            pipe.hmget(self.batch_key(flush_id), pks)
+        result = {}
+        for counts in pipe.execute():
+            for pk, count in zip(pks, counts):
+                if count:
+                    result[pk] = result.get(pk, 0) + int(count)
+        return result
+
+    def acquire_lock(self):
+        """获取写库锁，返回锁令牌，已被其他进程持有时返回None"""
+        token = uuid.uuid4().hex
+        if self.client.set(self.lock_key, token, nx=True, px=self.lock_timeout):
+            return token
+        return None
+
+    def release_lock(self, token):
+        self.client.eval(RELEASE_LOCK_SCRIPT, 1, self.lock_key, token)
+
+    def take(self):
+        """返回待写库的批次 [(批次编号, {主键: 增量})]
+
+        当前计数哈希原子改名为新批次，上次未确认的批次一并返回。调用方需持有写库锁。
+        """
+        if self.client.exists(self.key):
+            flush_id = uuid.uuid4().hex
+            pipe = self.client.pipeline(transaction=True)
+            pipe.rename(self.key, self.batch_key(flush_id))
+            pipe.sadd(self.batches_key, flush_id)
+            pipe.execute()
+
+        batches = []
+        for flush_id in self.flush_ids():
+            deltas = self.client.hgetall(self.batch_key(flush_id))
+            batches.append((flush_id, {int(pk): int(delta) for pk, delta in deltas.items()}))
+        return batches
+
+    def ack(self, flush_id):
+        """确认批次已写库"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.batch_key(flush_id))
+        pipe.srem(self.batches_key, flush_id)
+        pipe.execute()
+
+
+_play_counter = None
+_play_counter_lock = threading.Lock()
+
+
+def get_play_counter():
+    """获取播放计数器"""
+    global _play_counter
+    with _play_counter_lock:
+        if _play_counter is None:
+            _play_counter = RedisPlayCounter(redis.Redis.from_url(settings.MUSIC_PLAY_COUNTER_REDIS_URL))
+        return _play_counter
+
+
+def record_play(pk):
+    """记录一次播放，返回尚未写库的增量"""
+    return get_play_counter().incr(pk)
+
+
+def pending_plays(pks):
+    """查询尚未写库的播放增量，计数器不可用时返回空(只显示已写库的播放次数)"""
+    try:
+        return get_play_counter().pending(pks)
+    except redis.RedisError as e:
+        logger.error(f'读取播放计数失败: {str(e)}')
+        return {}
+
+
+def apply_play_counts(flush_id, deltas):
+    """在一个事务中写入一个批次的增量，每批一条 UPDATE ... SET play_count = play_count + CASE ...
+
+    返回写入的歌曲数，该批次已写入过时返回0。
+    """
+    items = sorted(deltas.items())
+    batch_size = settings.MUSIC_PLAY_COUNTER_BATCH_SIZE
+    try:
+        with transaction.atomic():
+            PlayCountFlush.objects.create(flush_id=flush_id, song_count=len(items))
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                Song.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                    play_count=F('play_count') + Case(
+                        *[When(pk=pk, then=Value(delta)) for pk, delta in batch],
+                        default=Value(0),
+                        output_field=IntegerField()
+                    )
+                )
+    except IntegrityError:
+        logger.warning(f'播放次数批次 {flush_id} 已写入，跳过')
+        return 0
+    return len(items)
+
+
+def flush_play_counts():
+    """将累计的播放增量写入数据库，返回写入的歌曲数
+
+    整个过程持有Redis锁，同一时刻只有一个任务写库；写库失败的批次保留在Redis中，
+    下次重试。
+    """
+    counter = get_play_counter()
+    token = counter.acquire_lock()
+    if token is None:
+        return 0
+
+    flushed = []
+    try:
+        for flush_id, deltas in counter.take():
+            try:
+                if apply_play_counts(flush_id, deltas):
+                    flushed.extend(deltas)
+            except Exception as e:
+                logger.error(f'写入播放次数失败，批次 {flush_id} 的{len(deltas)}首歌曲将在下次重试: {str(e)}')
+                raise
+            counter.ack(flush_id)
+    finally:
+        counter.release_lock(token)
+
+    if flushed:
+        # 批次编号只用于识别重复写入，未确认的批次会在下次写库时立即重试，过期记录可以清理
+        PlayCountFlush.objects.filter(applied_at__lt=timezone.now() - timedelta(days=7)).delete()
+        # 接口缓存中的播放次数随之失效
+        platform_ids = (
+            Song.objects.filter(pk__in=flushed)
+            .order_by().values_list('platform', flat=True).distinct()
+        )
+        invalidate_platforms(list(platform_ids))
+    return len(flushed)
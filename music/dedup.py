@@ -0,0 +1,287 @@
+import re
+import logging
+import unicodedata
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, Value, IntegerField
+from .models import Song, Work
+
+logger = logging.getLogger('django')
+
+# 括号内的版本说明，如 (Live)、（伴奏）、[Remastered]
+BRACKET_RE = re.compile(r'[\(\[（【][^\)\]）】]*[\)\]）】]')
+# 标题中的合作艺人说明
+FEATURING_RE = re.compile(r'\s(feat\.?|ft\.?|featuring)\s.*$')
+# 拉丁、希腊、西里尔字母(U+0000-U+052F)上的附加符号不区分，如 é 与 e；
+# 其他文字的组合符号(假名浊点、泰文元音等)有区别意义，保留
+ACCENT_BASE_MAX = '\u052f'
+# 多位艺人之间的分隔符
+ARTIST_SEPARATOR_RE = re.compile(r'\s*(?:/|&|,|，|、|;| x | feat\.? | ft\.? )\s*')
+
+
+def fold(text):
+    """兼容分解(全角转半角)、去掉字母上的附加符号并小写"""
+    chars = []
+    for char in unicodedata.normalize('NFKD', text or ''):
+        if unicodedata.combining(char) and chars and chars[-1] <= ACCENT_BASE_MAX:
+            continue
+        chars.append(char)
+    return unicodedata.normalize('NFC', ''.join(chars)).casefold()
+
+
+def word_chars(text):
+    """只保留各种文字的字母、数字及其组合符号，去掉标点和空白"""
+    return ''.join(
+        char for char in text
+        if char.isalnum() or unicodedata.category(char) in ('Mn', 'Mc')
+    )
+
+
+def normalize_title(title):
+    """标题指纹: 全角转半角、去掉附加符号、小写、去掉括号内说明和合作艺人、去掉标点空白
+
+    标题只有标点或为空时返回空字符串，这样的歌曲不参与去重。
+    """
+    text = fold(title)
+    text = BRACKET_RE.sub(' ', text)
+    text = FEATURING_RE.sub('', text)
+    return word_chars(text)[:200]
+
+
+def normalize_artist(name):
+    """艺术家指纹: 多位艺人按名称排序后拼接"""
+    names = [word_chars(part) for part in ARTIST_SEPARATOR_RE.split(fold(name))]
+    return '/'.join(sorted(name for name in names if name))[:200]
+
+
+def artists_match(a, b):
+    """艺术家指纹相同，或其中一方的艺人集合包含另一方(合唱曲在不同平台署名不全)
+
+    缺少艺术家时无法判断是否同一首歌，视为不匹配。
+    """
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    names_a, names_b = set(a.split('/')), set(b.split('/'))
+    return names_a <= names_b or names_b <= names_a
+
+
+def durations_match(a, b):
+    """时长相差不超过 MUSIC_DEDUP_DURATION_TOLERANCE 秒，缺少时长时不作判断"""
+    if not a or not b:
+        return True
+    return abs(a - b) <= settings.MUSIC_DEDUP_DURATION_TOLERANCE
+
+
+class Fingerprint:
+    """歌曲指纹"""
+
+    __slots__ = ('pk', 'title', 'artist_name', 'duration', 'title_key', 'artist_key', 'work_id')
+
+    def __init__(self, pk, title, artist_name, duration, work_id=None):
+        self.pk = pk
+        self.title = title
+        self.artist_name = artist_name or ''
+        self.duration = duration
+        self.title_key = normalize_title(title)
+        self.artist_key = normalize_artist(artist_name)
+        self.work_id = work_id
+
+    def matches(self, other):
+        """other 为 Fingerprint 或 Work，调用方已保证标题指纹相同(同一分块)"""
+        return (artists_match(self.artist_key, other.artist_key)
+                and durations_match(self.duration, other.duration))
+
+
+def song_fingerprints(queryset):
+    """逐行读取歌曲指纹"""
+    rows = queryset.values_list('pk', 'title', 'artist__name', 'duration', 'work')
+    for pk, title, artist_name, duration, work_id in rows.iterator(chunk_size=2000):
+        yield Fingerprint(pk, title, artist_name, duration, work_id)
+
+
+def cluster_block(fingerprints):
+    """对同一分块内的歌曲聚类，返回簇列表
+
+    先按艺术家指纹分组，再两两比较各组的代表，块内比较次数与艺术家数量相关，
+    不随重复歌曲数增长。缺少艺术家的歌曲各自成簇。
+    """
+    groups = {}
+    clusters = []
+    for fingerprint in fingerprints:
+        if not fingerprint.artist_key:
+            clusters.append([fingerprint])
+            continue
+        groups.setdefault((fingerprint.artist_key, fingerprint.duration), []).append(fingerprint)
+
+    for group in groups.values():
+        representative = group[0]
+        for cluster in clusters:
+            if representative.matches(cluster[0]):
+                cluster.extend(group)
+                break
+        else:
+            clusters.append(list(group))
+    return clusters
+
+
+def new_work(fingerprint):
+    """以指纹对应的歌曲为代表创建(未保存的)作品"""
+    return Work(
+        title=fingerprint.title[:200],
+        artist_name=fingerprint.artist_name[:200],
+        duration=fingerprint.duration,
+        title_key=fingerprint.title_key,
+        artist_key=fingerprint.artist_key,
+        canonical_song_id=fingerprint.pk,
+    )
+
+
+def release_canonical_songs(song_ids, batch_size=500):
+    """解除这些歌曲在原作品上的代表关系，以便改作其他作品的代表(一对一约束)"""
+    song_ids = list(song_ids)
+    for start in range(0, len(song_ids), batch_size):
+        Work.objects.filter(canonical_song__in=song_ids[start:start + batch_size]).update(canonical_song=None)
+
+
+def save_new_works(works):
+    """批量创建作品，返回 {代表歌曲主键: 作品主键}"""
+    if not works:
+        return {}
+    release_canonical_songs(work.canonical_song_id for work in works)
+    Work.objects.bulk_create(works, batch_size=500)
+    # MySQL 的 bulk_create 不回填主键，按代表歌曲查回
+    return dict(
+        Work.objects.filter(canonical_song__in=[work.canonical_song_id for work in works])
+        .values_list('canonical_song', 'pk')
+    )
+
+
+def update_song_works(assignments, batch_size=500):
+    """批量更新歌曲所属作品，assignments 为 {歌曲主键: 作品主键或None(解除)}"""
+    items = sorted(assignments.items())
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        Song.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+            work=Case(
+                *[When(pk=pk, then=Value(work_id)) for pk, work_id in batch],
+                output_field=IntegerField()
+            )
+        )
+
+
+def assign_works(song_ids):
+    """增量模式: 为新保存的歌曲匹配作品，找不到时新建
+
+    只查询与这些歌曲标题指纹相同的作品，开销与歌曲数成正比。
+    标题指纹为空的歌曲不参与去重，已归入的作品会被解除。
+    """
+    fingerprints = []
+    assignments = {}
+    for fingerprint in song_fingerprints(Song.objects.filter(pk__in=song_ids)):
+        if fingerprint.title_key:
+            fingerprints.append(fingerprint)
+        elif fingerprint.work_id is not None:
+            assignments[fingerprint.pk] = None
+    if not fingerprints and not assignments:
+        return 0
+
+    candidates = {}
+    for work in Work.objects.filter(title_key__in={fp.title_key for fp in fingerprints}):
+        candidates.setdefault(work.title_key, []).append(work)
+
+    pending = {}
+    for fingerprint in fingerprints:
+        block = candidates.setdefault(fingerprint.title_key, [])
+        current = next((work for work in block if work.pk == fingerprint.work_id), None)
+        if current is not None and fingerprint.matches(current):
+            continue
+        match = next((work for work in block if fingerprint.matches(work)), None)
+        if match is None:
+            # 同一批中的后续歌曲可以匹配到这里新建的作品
+            match = new_work(fingerprint)
+            block.append(match)
+            pending[fingerprint.pk] = match
+        assignments[fingerprint.pk] = match
+
+    with transaction.atomic():
+        created = save_new_works(list(pending.values()))
+        resolved = {
+            pk: None if work is None else work.pk or created[work.canonical_song_id]
+            for pk, work in assignments.items()
+        }
+        update_song_works(resolved)
+    return len(resolved)
+
+
+def safe_assign_works(song_ids):
+    """保存路径中调用的增量去重，失败只记录日志，可通过 rebuild_works 重建"""
+    if not settings.MUSIC_DEDUP_ON_SAVE:
+        return
+    try:
+        assign_works(song_ids)
+    except Exception as e:
+        logger.error(f'歌曲去重失败: {str(e)}')
+
+
+def rebuild_works(batch_size=500):
+    """全量重建作品聚类，返回 (作品数, 歌曲数)
+
+    所有歌曲按标题指纹分块，只在块内比较。已有作品编号尽量沿用
+    (取簇内歌曲最多的原作品)，不再被引用的作品最后删除。
+    """
+    blocks = {}
+    songs = 0
+    unkeyed = []
+    for fingerprint in song_fingerprints(Song.objects.order_by('pk')):
+        songs += 1
+        if fingerprint.title_key:
+            blocks.setdefault(fingerprint.title_key, []).append(fingerprint)
+        elif fingerprint.work_id is not None:
+            # 标题指纹为空的歌曲不参与去重
+            unkeyed.append(fingerprint.pk)
+
+    existing = Work.objects.in_bulk()
+    claimed = set()
+    assignments = {}
+    pending = {}
+    changed_works = []
+    for block in blocks.values():
+        for cluster in cluster_block(block):
+            canonical = min(cluster, key=lambda fp: fp.pk)
+            votes = {}
+            for fingerprint in cluster:
+                if fingerprint.work_id in existing and fingerprint.work_id not in claimed:
+                    votes[fingerprint.work_id] = votes.get(fingerprint.work_id, 0) + 1
+            if votes:
+                work = existing[max(votes, key=votes.get)]
+                claimed.add(work.pk)
+                fresh = new_work(canonical)
+                if (work.title_key, work.artist_key, work.duration, work.canonical_song_id) != \
+                        (fresh.title_key, fresh.artist_key, fresh.duration, fresh.canonical_song_id):
+                    work.title, work.artist_name, work.duration = fresh.title, fresh.artist_name, fresh.duration
+                    work.title_key, work.artist_key = fresh.title_key, fresh.artist_key
+                    work.canonical_song_id = fresh.canonical_song_id
+                    changed_works.append(work)
+            else:
+                work = new_work(canonical)
+                pending[canonical.pk] = work
+            for fingerprint in cluster:
+                assignments[fingerprint] = work
+
+    with transaction.atomic():
+        # 先解除将被改用的代表歌曲，避免一对一约束冲突
+        release_canonical_songs([work.canonical_song_id for work in changed_works], batch_size)
+        Work.objects.bulk_update(changed_works, ['title', 'artist_name', 'duration', 'title_key',
+                                                 'artist_key', 'canonical_song'], batch_size=batch_size)
+        created = save_new_works(list(pending.values()))
+        resolved = dict.fromkeys(unkeyed)
+        for fingerprint, work in assignments.items():
+            work_id = work.pk if work.pk else created[work.canonical_song_id]
+            if fingerprint.work_id != work_id:
+                resolved[fingerprint.pk] = work_id
+        update_song_works(resolved, batch_size)
+        Work.objects.filter(songs__isnull=True).delete()
+
+    return len(claimed) + len(pending), songs
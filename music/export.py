@@ -0,0 +1,141 @@
+import csv
+import json
+import zlib
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from .models import Song, Artist, Album
+
+
+# 导出类型 -> (模型, 字段, 关联字段别名)
+EXPORT_TYPES = {
+    'songs': (Song, [
+        'id', 'title', 'artist', 'album', 'duration', 'lyrics', 'genre',
+        'platform', 'platform_id', 'platform_url', 'audio_url',
+        'play_count', 'like_count', 'work', 'created_at', 'updated_at',
+    ], {'artist_name': 'artist__name', 'album_title': 'album__title'}),
+    'artists': (Artist, [
+        'id', 'name', 'biography', 'platform', 'platform_id', 'platform_url',
+        'created_at', 'updated_at',
+    ], {}),
+    'albums': (Album, [
+        'id', 'title', 'artist', 'description', 'release_date',
+        'platform', 'platform_id', 'platform_url', 'created_at', 'updated_at',
+    ], {'artist_name': 'artist__name'}),
+}
+
+EXPORT_FORMATS = ['ndjson', 'csv']
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_columns(export_type):
+    """返回导出的列名"""
+    model, fields, aliases = EXPORT_TYPES[export_type]
+    return fields + list(aliases)
+
+
+def export_rows(export_type, platform=None, since=None, until=None, chunk_size=None):
+    """按主键顺序逐块读取数据，返回字典生成器
+
+    每块用 pk > 上一块最后主键 + LIMIT 查询(键集分页)，不依赖服务端游标
+    (mysqlclient 的 iterator() 仍会把整个结果集读入客户端)，也不加载模型实例，
+    内存占用与数据量无关。
+    since/until 为 updated_at 的水位线，导出 (since, until] 区间内更新过的数据。
+    """
+    model, fields, aliases = EXPORT_TYPES[export_type]
+    queryset = model.objects.all()
+    if platform is not None:
+        queryset = queryset.filter(platform=platform)
+    if since is not None:
+        queryset = queryset.filter(updated_at__gt=since)
+    if until is not None:
+        queryset = queryset.filter(updated_at__lte=until)
+
+    queryset = queryset.order_by('pk').values(
+        *fields, **{alias: F(lookup) for alias, lookup in aliases.items()}
+    )
+    chunk_size = chunk_size or settings.MUSIC_EXPORT_CHUNK_SIZE
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1]['id']
+
+
+class Echo:
+    """只返回写入内容的伪文件，配合 csv.writer 逐行生成"""
+
+    def write(self, value):
+        return value
+
+
+def render_ndjson(rows):
+    """每行一个JSON对象"""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+
+def render_csv(rows, columns):
+    """带表头的CSV"""
+    writer = csv.writer(Echo())
+    encoder = DjangoJSONEncoder()
+    yield writer.writerow(columns)
+    for row in rows:
+        values = []
+        for column in columns:
+            value = row[column]
+            if value is None:
+                value = ''
+            elif not isinstance(value, (str, int, float)):
+                value = encoder.default(value)
+            values.append(value)
+        yield writer.writerow(values)
+
+
+def gzip_stream(chunks, buffer_size=64 * 1024):
+    """把文本块流式压缩为gzip字节块"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            compressed = compressor.compress(b''.join(buffer))
+            buffer, size = [], 0
+            if compressed:
+                yield compressed
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
+
+
+def encode_stream(chunks, buffer_size=64 * 1024):
+    """把文本块合并为较大的字节块，减少写入次数"""
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def export_stream(export_type, export_format='ndjson', compress=False, **filters):
+    """生成导出文件的字节流"""
+    rows = export_rows(export_type, **filters)
+    if export_format == 'csv':
+        chunks = render_csv(rows, export_columns(export_type))
+    else:
+        chunks = render_ndjson(rows)
+    return gzip_stream(chunks) if compress else encode_stream(chunks)
@@ -0,0 +1,119 @@
+from django.core.exceptions import FieldDoesNotExist
+
+
+def parse_field_list(value):
+    """解析逗号分隔的字段列表"""
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+class SparseFieldsetSerializerMixin:
+    """按 context['sparse_fields'] 只保留需要的字段
+
+    sparse_fields 为 None 时输出全部字段。
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get('sparse_fields')
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+class SparseFieldsetMixin:
+    """视图集的稀疏字段集: ?fields=a,b 只返回指定字段，?exclude=a,b 排除字段
+
+    序列化器只输出选中的字段，查询集用 only() 只读取这些字段对应的列
+    (包括 select_related 关联表的列)，未选中的大字段既不查询也不序列化。
+    list_exclude 为列表类接口默认排除的字段。
+    """
+    sparse_actions = ('list', 'retrieve')
+    list_actions = ('list',)
+    list_exclude = []
+
+    def get_sparse_fields(self):
+        """返回本次请求选中的序列化器字段名集合，None 表示全部字段"""
+        if getattr(self, 'action', None) not in self.sparse_actions:
+            return None
+
+        fields = parse_field_list(self.request.query_params.get('fields'))
+        exclude = parse_field_list(self.request.query_params.get('exclude'))
+        if not fields and not exclude and self.action not in self.list_actions:
+            return None
+
+        serializer_class = self.get_serializer_class()
+        available = list(serializer_class().fields)
+        if fields:
+            # 主键始终返回，便于客户端关联数据
+            selected = {name for name in available if name in fields or name == 'id'}
+        else:
+            excluded = set(exclude)
+            if self.action in self.list_actions:
+                excluded.update(self.list_exclude)
+            selected = {name for name in available if name not in excluded}
+        return selected
+
+    def get_queryset(self):
+        return self.apply_sparse_fields(super().get_queryset())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sparse_fields'] = self.get_sparse_fields()
+        return context
+
+    def apply_sparse_fields(self, queryset):
+        """按选中的字段限制查询的列"""
+        selected = self.get_sparse_fields()
+        if selected is None:
+            return queryset
+
+        serializer_class = self.get_serializer_class()
+        dependencies = getattr(serializer_class.Meta, 'field_dependencies', {})
+        serializer_fields = serializer_class().fields
+        paths = set()
+        relations = set()
+        for name in selected:
+            sources = dependencies.get(name) or [serializer_fields[name].source]
+            for source in sources:
+                resolved = self.resolve_source(queryset.model, source)
+                if resolved is None:
+                    # 无法确定需要哪些列(如依赖整个对象)，不做限制
+                    return queryset
+                path, relation = resolved
+                paths.add(path)
+                if relation:
+                    relations.add(relation)
+
+        # 不带参数的 select_related() 会关联全部外键，只在确有需要时调用
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*paths)
+
+    @staticmethod
+    def resolve_source(model, source):
+        """把序列化器字段的 source 转换为 (only() 路径, 需要 select_related 的关联)
+
+        无法对应到模型字段时返回None。
+        """
+        if source == '*':
+            return None
+        attrs = source.split('.')
+        parts = []
+        relation = None
+        for index, attr in enumerate(attrs):
+            if model is None:
+                return None
+            try:
+                field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete:
+                return None
+            parts.append(attr)
+            if field.is_relation and index < len(attrs) - 1:
+                relation = '__'.join(parts)
+                model = field.related_model
+            else:
+                model = None
+        return '__'.join(parts), relation
@@ -0,0 +1,138 @@
+import heapq
+import logging
+import threading
+import redis
+from django.conf import settings
+
+logger = logging.getLogger('django')
+
+
+def board_names(platform_id, genre):
+    """一首歌曲所属的榜单: 总榜、平台榜和类型榜"""
+    names = ['all', f'platform:{platform_id}']
+    if genre:
+        names.append(f'genre:{genre}')
+    return names
+
+
+class LocalLeaderboard:
+    """进程内榜单，用于测试或未配置Redis时"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._boards = {}
+        self._lock = threading.Lock()
+
+    def update(self, board, scores):
+        """更新榜单中的歌曲播放次数，scores 为 {歌曲主键: 播放次数}"""
+        with self._lock:
+            entries = self._boards.setdefault(board, {})
+            entries.update(scores)
+            if len(entries) > self.capacity * 2:
+                self._boards[board] = dict(heapq.nlargest(self.capacity, entries.items(), key=lambda e: e[1]))
+
+    def replace(self, board, scores):
+        """整体替换榜单"""
+        with self._lock:
+            self._boards[board] = dict(scores)
+
+    def remove(self, board, pks):
+        """从榜单中移除歌曲"""
+        with self._lock:
+            entries = self._boards.get(board, {})
+            for pk in pks:
+                entries.pop(pk, None)
+
+    def top(self, board, limit):
+        """返回榜单前 limit 名的歌曲主键"""
+        with self._lock:
+            entries = list(self._boards.get(board, {}).items())
+        return [pk for pk, _ in heapq.nlargest(limit, entries, key=lambda e: e[1])]
+
+
+class RedisLeaderboard:
+    """基于Redis有序集合的榜单，Web和Worker进程共享"""
+
+    def __init__(self, client, capacity):
+        self.client = client
+        self.capacity = capacity
+
+    @staticmethod
+    def key(board):
+        return f'melody_hunter:leaderboard:{board}'
+
+    def update(self, board, scores):
+        """更新榜单中的歌曲播放次数，只保留前 capacity 名"""
+        key = self.key(board)
+        pipe = self.client.pipeline()
+        pipe.zadd(key, scores)
+        pipe.zremrangebyrank(key, 0, -(self.capacity + 1))
+        pipe.execute()
+
+    def replace(self, board, scores):
+        """整体替换榜单(先写临时键再原子改名)"""
+        key = self.key(board)
+        pipe = self.client.pipeline()
+        if scores:
+            pipe.zadd(f'{key}:rebuild', scores)
+            pipe.rename(f'{key}:rebuild', key)
+        else:
+            pipe.delete(key)
+        pipe.execute()
+
+    def remove(self, board, pks):
+        """从榜单中移除歌曲"""
+        self.client.zrem(self.key(board), *pks)
+
+    def top(self, board, limit):
+        """返回榜单前 limit 名的歌曲主键"""
+        return [int(pk) for pk in self.client.zrevrange(self.key(board), 0, limit - 1)]
+
+
+_leaderboard = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard():
+    """获取热门歌曲榜单，容量为展示数量的两倍，留出排名波动的余量"""
+    global _leaderboard
+    with _leaderboard_lock:
+        if _leaderboard is None:
+            capacity = settings.MUSIC_LEADERBOARD_SIZE * 2
+            if settings.MUSIC_LEADERBOARD_BACKEND == 'redis':
+                client = redis.Redis.from_url(settings.MUSIC_LEADERBOARD_REDIS_URL)
+                _leaderboard = RedisLeaderboard(client, capacity)
+            else:
+                _leaderboard = LocalLeaderboard(capacity)
+        return _leaderboard
+
+
+def record_play_counts(rows):
+    """增量更新榜单，rows 为 [(歌曲主键, 平台主键, 类型, 播放次数)]"""
+    boards = {}
+    for pk, platform_id, genre, play_count in rows:
+        for board in board_names(platform_id, genre):
+            boards.setdefault(board, {})[pk] = play_count
+
+    try:
+        leaderboard = get_leaderboard()
+        for board, scores in boards.items():
+            leaderboard.update(board, scores)
+    except redis.RedisError as e:
+        # 榜单更新失败不影响数据保存，可通过 rebuild_leaderboard 重建
+        logger.error(f'更新热门榜单失败: {str(e)}')
+
+
+def remove_from_boards(pk, boards):
+    """把歌曲从指定榜单中移除(歌曲删除或平台、类型变化时)"""
+    try:
+        leaderboard = get_leaderboard()
+        for board in boards:
+            leaderboard.remove(board, [pk])
+    except redis.RedisError as e:
+        logger.error(f'更新热门榜单失败: {str(e)}')
+
+
+def record_songs(queryset):
+    """按查询集增量更新榜单"""
+    record_play_counts(queryset.values_list('pk', 'platform', 'genre', 'play_count'))
@@ -0,0 +1,129 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+from music.models import Platform
+from music.pagination import KeysetPagination
+from music.views import SongViewSet, ArtistViewSet, AlbumViewSet
+from crawler.models import CrawlTask, CrawlLog
+from crawler.pagination import CrawlLogCursorPagination
+from crawler.views import CrawlLogViewSet
+
+
+# (说明, 视图集, 查询参数): 列表接口的主要访问路径，均应由索引直接提供顺序。
+# 视图集为None表示任务的日志接口
+# 参数值为模型类时取该表任意一条记录的主键(外键过滤要求记录存在)
+PLAN_CASES = [
+    ('歌曲列表', SongViewSet, {}),
+    ('歌曲按播放量排序', SongViewSet, {'ordering': '-play_count'}),
+    ('歌曲按标题排序', SongViewSet, {'ordering': 'title'}),
+    ('歌曲按时长排序', SongViewSet, {'ordering': 'duration'}),
+    ('歌曲按点赞数排序', SongViewSet, {'ordering': '-like_count'}),
+    ('歌曲按平台过滤', SongViewSet, {'platform': Platform}),
+    ('歌曲按类型过滤', SongViewSet, {'genre': 'pop'}),
+    ('艺术家列表', ArtistViewSet, {}),
+    ('艺术家按名称排序', ArtistViewSet, {'ordering': 'name'}),
+    ('艺术家按平台过滤', ArtistViewSet, {'platform': Platform}),
+    ('专辑列表', AlbumViewSet, {}),
+    ('专辑按标题排序', AlbumViewSet, {'ordering': 'title'}),
+    ('专辑按发行日期排序', AlbumViewSet, {'ordering': '-release_date'}),
+    ('专辑按平台过滤', AlbumViewSet, {'platform': Platform}),
+    ('任务日志按级别过滤', CrawlLogViewSet, {'task': CrawlTask, 'level': 'ERROR'}),
+    ('任务日志', CrawlLogViewSet, {'task': CrawlTask}),
+    ('任务日志接口', None, {'task': CrawlTask}),
+    ('任务日志接口按级别过滤', None, {'task': CrawlTask, 'level': 'ERROR,WARNING'}),
+]
+
+
+def build_queryset(viewset, params):
+    """生成视图集列表接口第一页实际执行的查询，外键参数找不到记录时返回None"""
+    resolved = {}
+    for name, value in params.items():
+        if isinstance(value, type):
+            value = value.objects.values_list('pk', flat=True).first()
+            if value is None:
+                return None
+        resolved[name] = value
+
+    if viewset is None:
+        return build_task_logs_queryset(resolved)
+
+    view = viewset(action_map={'get': 'list'}, args=(), kwargs={}, format_kwarg=None)
+    request = view.initialize_request(APIRequestFactory().get('/', resolved))
+    view.request = request
+    queryset = view.filter_queryset(view.get_queryset())
+
+    paginator = view.paginator
+    if isinstance(paginator, KeysetPagination):
+        page_size = paginator.get_page_size(request)
+        return paginator.order_queryset(queryset, request, view)[:page_size + 1]
+    return queryset[:paginator.get_page_size(request) if paginator else 20]
+
+
+def build_task_logs_queryset(params):
+    """生成 /tasks/{id}/logs/ 接口第一页执行的查询(见 CrawlTaskViewSet.logs)"""
+    logs = CrawlLog.objects.filter(task=params['task'])
+    levels = [level for level in params.get('level', '').split(',') if level]
+    if levels:
+        logs = logs.filter(level__in=levels)
+    paginator = CrawlLogCursorPagination()
+    return logs.order_by(paginator.ordering)[:paginator.page_size + 1]
+
+
+def explain(queryset):
+    """执行EXPLAIN，返回 (执行计划文本, 问题列表)"""
+    sql, params = queryset.query.sql_with_params()
+    problems = []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            for row in rows:
+                if row.get('type') == 'ALL':
+                    problems.append(f'全表扫描 {row["table"]}')
+                if 'Using filesort' in (row.get('Extra') or ''):
+                    problems.append(f'文件排序 {row["table"]}')
+            plan = '\n'.join(
+                f'{row["table"]}: type={row["type"]} key={row["key"]} rows={row["rows"]} {row.get("Extra") or ""}'
+                for row in rows
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            details = [row[-1] for row in cursor.fetchall()]
+            for detail in details:
+                if detail.startswith('SCAN ') and ' USING ' not in detail:
+                    problems.append(f'全表扫描 {detail[5:]}')
+                if 'TEMP B-TREE FOR ORDER BY' in detail:
+                    problems.append('文件排序')
+            plan = '\n'.join(details)
+        else:
+            raise CommandError(f'不支持的数据库: {connection.vendor}')
+    return plan, problems
+
+
+class Command(BaseCommand):
+    help = '对列表接口生成的查询执行EXPLAIN，出现全表扫描或文件排序时返回失败'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plan', action='store_true', help='输出完整执行计划')
+
+    def handle(self, *args, **options):
+        failures = 0
+        for description, viewset, params in PLAN_CASES:
+            queryset = build_queryset(viewset, params)
+            if queryset is None:
+                self.stdout.write(self.style.WARNING(f'- {description}: 缺少数据，已跳过'))
+                continue
+            plan, problems = explain(queryset)
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'✗ {description}: {", ".join(problems)}'))
+            else:
+                self.stdout.write(f'✓ {description}')
+            if options['verbose_plan'] or problems:
+                self.stdout.write(f'    {plan}'.replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f'{failures} 个查询未能使用索引，'
+                               f'请在数据量接近线上的库中执行并检查索引')
+        self.stdout.write(self.style.SUCCESS(f'{len(PLAN_CASES)} 个查询均使用索引'))
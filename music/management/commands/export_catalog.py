@@ -0,0 +1,56 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from music.models import Platform
+from music.export import EXPORT_TYPES, EXPORT_FORMATS, export_stream
+
+
+class Command(BaseCommand):
+    help = '流式导出歌曲/艺术家/专辑数据(NDJSON/CSV，可gzip压缩)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=list(EXPORT_TYPES), help='导出的数据类型')
+        parser.add_argument('--format', type=str, default='ndjson', choices=EXPORT_FORMATS,
+                          help='导出格式')
+        parser.add_argument('--gzip', action='store_true', help='gzip压缩输出')
+        parser.add_argument('--output', type=str, help='输出文件路径（默认标准输出）')
+        parser.add_argument('--platform', type=str, help='只导出指定平台（平台名称）')
+        parser.add_argument('--since', type=str,
+                          help='只导出该时间之后更新的数据（上次导出输出的水位线）')
+        parser.add_argument('--chunk-size', type=int, help='每次从数据库读取的行数')
+
+    def handle(self, *args, **options):
+        platform = None
+        if options['platform']:
+            try:
+                platform = Platform.objects.get(name=options['platform'])
+            except Platform.DoesNotExist:
+                raise CommandError(f'平台 "{options["platform"]}" 不存在')
+
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('--since 时间格式无效')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        until = timezone.now()
+        stream = export_stream(
+            options['type'], options['format'], options['gzip'],
+            platform=platform, since=since, until=until,
+            chunk_size=options['chunk_size'],
+        )
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in stream:
+                    f.write(chunk)
+        else:
+            for chunk in stream:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+
+        # 水位线写到标准错误，避免混入标准输出的导出数据
+        self.stderr.write(f'导出完成，下次增量导出可使用 --since {until.isoformat()}')
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from music.models import Song, Platform
+from music.leaderboard import get_leaderboard
+
+
+class Command(BaseCommand):
+    help = '从数据库重建热门歌曲榜单(总榜、平台榜、类型榜)'
+
+    def handle(self, *args, **options):
+        leaderboard = get_leaderboard()
+        capacity = settings.MUSIC_LEADERBOARD_SIZE * 2
+        songs = Song.objects.order_by('-play_count')
+
+        boards = {'all': songs}
+        for platform_id in Platform.objects.values_list('pk', flat=True):
+            boards[f'platform:{platform_id}'] = songs.filter(platform=platform_id)
+        genres = Song.objects.exclude(genre='').order_by().values_list('genre', flat=True).distinct()
+        for genre in genres:
+            boards[f'genre:{genre}'] = songs.filter(genre=genre)
+
+        for board, queryset in boards.items():
+            scores = dict(queryset.values_list('pk', 'play_count')[:capacity])
+            leaderboard.replace(board, scores)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'热门榜单重建完成，共 {len(boards)} 个榜单')
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from music.models import Song
+from music.search import get_song_index
+
+
+class Command(BaseCommand):
+    help = '重建歌曲全文索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批写入的歌曲数')
+
+    def handle(self, *args, **options):
+        index = get_song_index()
+        index.clear()
+
+        batch_size = options['batch_size']
+        rows = (
+            Song.objects.order_by()
+            .values_list('pk', 'title', 'artist__name', 'album__title', 'lyrics')
+            .iterator(chunk_size=batch_size)
+        )
+
+        batch = []
+        total = 0
+        for pk, title, artist, album, lyrics in rows:
+            batch.append((pk, title, artist or '', album or '', lyrics))
+            if len(batch) >= batch_size:
+                index.index(batch)
+                total += len(batch)
+                batch = []
+                self.stdout.write(f'已索引 {total} 首歌曲')
+        index.index(batch)
+        total += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'全文索引重建完成，共 {total} 首歌曲')
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from music.models import Platform
+from music.dedup import rebuild_works
+from music.responsecache import invalidate_platforms
+
+
+class Command(BaseCommand):
+    help = '全量重建跨平台歌曲去重的作品聚类'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每条UPDATE语句包含的歌曲数')
+
+    def handle(self, *args, **options):
+        works, songs = rebuild_works(batch_size=options['batch_size'])
+        invalidate_platforms(Platform.objects.values_list('pk', flat=True))
+        self.stdout.write(
+            self.style.SUCCESS(f'作品聚类重建完成，{songs}首歌曲归并为{works}个作品')
+        )
\ No newline at end of file
@@ -7,6 +7,10 @@ class Platform(models.Model):
     name = models.CharField(max_length=100, verbose_name='平台名称')
     base_url = models.URLField(verbose_name='平台基础URL')
     is_active = models.BooleanField(default=True, verbose_name='是否激活')
+    rate_limit = models.FloatField(default=1.0, verbose_name='每秒请求数',
+                                   help_text='所有Worker对该平台的总请求速率上限')
+    rate_burst = models.PositiveIntegerField(default=1, verbose_name='突发请求数')
+    cache_ttl = models.PositiveIntegerField(default=3600, verbose_name='响应缓存有效期(秒)')
     created_at = models.DateTimeField(default=timezone.now, verbose_name='创建时间')
     
     class Meta:
@@ -32,6 +36,13 @@ class Artist(models.Model):
         verbose_name = '艺术家'
         verbose_name_plural = '艺术家'
         unique_together = ['platform', 'platform_id']
+        # 与列表接口的排序(键集分页按 排序字段+主键)和增量导出的水位线过滤对应
+        indexes = [
+            models.Index(fields=['created_at'], name='artist_created_at_idx'),
+            models.Index(fields=['name'], name='artist_name_idx'),
+            models.Index(fields=['updated_at'], name='artist_updated_at_idx'),
+            models.Index(fields=['platform', 'created_at'], name='artist_platform_created_at_idx'),
+        ]
         
     def __str__(self):
         return f"{self.name} ({self.platform.name})"
@@ -54,6 +65,13 @@ class Album(models.Model):
         verbose_name = '专辑'
         verbose_name_plural = '专辑'
         unique_together = ['platform', 'platform_id']
+        indexes = [
+            models.Index(fields=['created_at'], name='album_created_at_idx'),
+            models.Index(fields=['title'], name='album_title_idx'),
+            models.Index(fields=['release_date'], name='album_release_date_idx'),
+            models.Index(fields=['updated_at'], name='album_updated_at_idx'),
+            models.Index(fields=['platform', 'created_at'], name='album_platform_created_at_idx'),
+        ]
         
     def __str__(self):
         return f"{self.title} - {self.artist.name}"
@@ -66,6 +84,8 @@ class Song(models.Model):
     album = models.ForeignKey(Album, on_delete=models.CASCADE, blank=True, null=True, verbose_name='专辑')
     duration = models.PositiveIntegerField(blank=True, null=True, verbose_name='时长(秒)')
     lyrics = models.TextField(blank=True, verbose_name='歌词')
+    # 最近一次从平台获取歌词的时间(见 crawler.lyrics)，为空表示从未获取
+    lyrics_updated_at = models.DateTimeField(blank=True, null=True, verbose_name='歌词获取时间')
     genre = models.CharField(max_length=100, blank=True, verbose_name='音乐类型')
     
     # 平台相关信息
@@ -81,6 +101,13 @@ class Song(models.Model):
     play_count = models.PositiveIntegerField(default=0, verbose_name='播放次数')
     like_count = models.PositiveIntegerField(default=0, verbose_name='点赞数')
     
+    # 抓取内容的指纹(不含播放、点赞等计数)，增量爬取时据此跳过未变化的歌曲
+    content_hash = models.CharField(max_length=32, blank=True, verbose_name='内容指纹')
+    
+    # 跨平台去重: 不同平台上的同一首歌归入同一作品(见 music.dedup)
+    work = models.ForeignKey('Work', on_delete=models.SET_NULL, blank=True, null=True,
+                             related_name='songs', verbose_name='作品')
+    
     created_at = models.DateTimeField(default=timezone.now, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
@@ -88,6 +115,18 @@ class Song(models.Model):
         verbose_name = '歌曲'
         verbose_name_plural = '歌曲'
         unique_together = ['platform', 'platform_id']
+        # 按平台、类型过滤时仍按默认排序(created_at)返回，使用组合索引避免排序
+        indexes = [
+            models.Index(fields=['created_at'], name='song_created_at_idx'),
+            models.Index(fields=['play_count'], name='song_play_count_idx'),
+            models.Index(fields=['title'], name='song_title_idx'),
+            models.Index(fields=['duration'], name='song_duration_idx'),
+            models.Index(fields=['like_count'], name='song_like_count_idx'),
+            models.Index(fields=['updated_at'], name='song_updated_at_idx'),
+            models.Index(fields=['platform', 'created_at'], name='song_platform_created_at_idx'),
+            models.Index(fields=['genre', 'created_at'], name='song_genre_created_at_idx'),
+            models.Index(fields=['platform', 'lyrics_updated_at'], name='song_platform_lyrics_idx'),
+        ]
         
     def __str__(self):
         return f"{self.title} - {self.artist.name}"
@@ -98,4 +137,39 @@ class Song(models.Model):
             minutes = self.duration // 60
             seconds = self.duration % 60
             return f"{minutes:02d}:{seconds:02d}"
-        return "未知"
\ No newline at end of file
+        return "未知"
+
+
+class Work(models.Model):
+    """作品模型，聚合各平台上的同一首歌曲"""
+    title = models.CharField(max_length=200, verbose_name='标题')
+    artist_name = models.CharField(max_length=200, blank=True, verbose_name='艺术家')
+    duration = models.PositiveIntegerField(blank=True, null=True, verbose_name='时长(秒)')
+    # 归一化后的指纹，标题指纹同时作为分块键
+    title_key = models.CharField(max_length=200, db_index=True, verbose_name='标题指纹')
+    artist_key = models.CharField(max_length=200, blank=True, verbose_name='艺术家指纹')
+    canonical_song = models.OneToOneField(Song, on_delete=models.SET_NULL, blank=True, null=True,
+                                          related_name='+', verbose_name='代表歌曲')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '作品'
+        verbose_name_plural = '作品'
+        
+    def __str__(self):
+        return f"{self.title} - {self.artist_name}"
+
+
+class PlayCountFlush(models.Model):
+    """已写入数据库的播放次数批次(见 music.counters)，用于避免同一批次重复累加"""
+    flush_id = models.CharField(max_length=32, unique=True, verbose_name='批次编号')
+    song_count = models.PositiveIntegerField(default=0, verbose_name='歌曲数')
+    applied_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='写入时间')
+    
+    class Meta:
+        verbose_name = '播放次数批次'
+        verbose_name_plural = '播放次数批次'
+        
+    def __str__(self):
+        return self.flush_id
\ No newline at end of file
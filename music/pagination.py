@@ -0,0 +1,173 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework import filters
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """键集(游标)分页
+
+    按 (排序字段, 主键) 排序，游标记录上一页最后一行的排序值和主键，
+    下一页用 WHERE 条件定位而不是 OFFSET，翻页深度不影响查询速度，
+    抓取过程中插入的新数据也不会导致重复或遗漏。排序字段取自 ordering 参数
+    (受视图 ordering_fields 限制)，主键作为同值时的次序，与排序字段同向。
+    总数只在无过滤条件时给出数据库的估算值，不执行 COUNT(*)。
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    # 全文检索按相关度排序时使用的注解字段(见 music.search)
+    rank_annotation = 'search_rank'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        queryset = self.order_queryset(queryset, request, view)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(queryset, *cursor))
+
+        self.count = self.estimate_count(queryset) if cursor is None else None
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def order_queryset(self, queryset, request, view):
+        """按 (排序字段, 主键) 排序"""
+        self.field, self.descending = self.get_ordering(request, queryset, view)
+        self.nullable = self.is_nullable(queryset, self.field)
+
+        # 使用 only() 限制列时补上排序字段，生成游标时不必再单独查询
+        loaded, deferred = queryset.query.deferred_loading
+        if (loaded and not deferred and self.field != 'pk'
+                and self.field not in queryset.query.annotations):
+            queryset = queryset.only(*loaded, self.field)
+
+        pk_order = '-pk' if self.descending else 'pk'
+        field_order = f'-{self.field}' if self.descending else self.field
+        return queryset.order_by(field_order, pk_order)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request, queryset, view):
+        """返回 (排序字段, 是否倒序)"""
+        if (self.rank_annotation in queryset.query.annotations
+                and not request.query_params.get('ordering')):
+            return self.rank_annotation, False
+
+        ordering = filters.OrderingFilter().get_ordering(request, queryset, view) or ['-pk']
+        term = ordering[0]
+        field = term.lstrip('-')
+        if field == 'id':
+            field = 'pk'
+        return field, term.startswith('-')
+
+    def is_nullable(self, queryset, field):
+        if field == 'pk' or field in queryset.query.annotations:
+            return False
+        return queryset.model._meta.get_field(field).null
+
+    def get_value(self, obj):
+        return obj.pk if self.field == 'pk' else getattr(obj, self.field)
+
+    def after(self, queryset, value, pk):
+        """定位到 (value, pk) 之后的条件。MySQL中NULL最小: 正序排在最前，倒序排在最后"""
+        if self.field == 'pk':
+            return Q(pk__lt=pk) if self.descending else Q(pk__gt=pk)
+
+        field = self.field
+        if self.descending:
+            if value is None:
+                return Q(**{f'{field}__isnull': True, 'pk__lt': pk})
+            condition = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+            if self.nullable:
+                condition |= Q(**{f'{field}__isnull': True})
+            return condition
+
+        if value is None:
+            return Q(**{f'{field}__isnull': False}) | Q(**{f'{field}__isnull': True, 'pk__gt': pk})
+        return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if data['f'] != self.field or data['d'] != self.descending:
+                raise ValueError('排序方式与游标不一致')
+            value = data['v']
+            if self.field == self.rank_annotation:
+                if type(value) is not int:
+                    raise ValueError('相关度排名必须是整数')
+            elif value is not None and self.field != 'pk':
+                value = self.model._meta.get_field(self.field).to_python(value)
+            pk = self.model._meta.pk.to_python(data['pk'])
+            if pk is None:
+                raise ValueError('游标缺少主键')
+            return value, pk
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound('无效的游标')
+
+    def encode_cursor(self, obj):
+        value = self.get_value(obj)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        data = {'f': self.field, 'd': self.descending, 'v': value, 'pk': obj.pk}
+        return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+
+    def estimate_count(self, queryset):
+        """无过滤条件时返回数据库统计信息中的估算行数，否则返回None"""
+        if queryset.query.where or connection.vendor != 'mysql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,133 @@
+import time
+import hashlib
+import logging
+import functools
+import redis
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+logger = logging.getLogger('django')
+
+GLOBAL_GENERATION_KEY = 'music:generation:all'
+
+
+def platform_generation_key(platform_id):
+    return f'music:generation:platform:{platform_id}'
+
+
+def initial_generation():
+    """代数初始值取当前时间(微秒)，计数器被淘汰后重建也不会与旧值重复"""
+    return time.time_ns() // 1000
+
+
+def get_generations(keys):
+    """读取一组代数计数器，不存在的先初始化"""
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        for key in missing:
+            cache.add(key, initial_generation(), None)
+        values.update(cache.get_many(missing))
+    return values
+
+
+def invalidate_platforms(platform_ids):
+    """平台数据写入后递增其代数，只使该平台相关的缓存失效
+
+    未按平台限定的缓存依赖全局代数，任何写入都会递增全局代数。
+    """
+    keys = [platform_generation_key(platform_id) for platform_id in set(platform_ids)]
+    for key in keys + [GLOBAL_GENERATION_KEY]:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, initial_generation(), None)
+
+
+def response_cache_key(view, request):
+    """按视图、动作、URL参数和规范化的查询参数生成缓存键"""
+    params = urlencode(sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+    ))
+    raw = '|'.join([
+        request.get_host(),
+        view.basename or type(view).__name__,
+        view.action or '',
+        urlencode(sorted(view.kwargs.items())),
+        params,
+    ])
+    return 'music:response:' + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def cache_response(method):
+    """缓存视图方法的响应
+
+    缓存项记录生成时所依赖的代数计数器，读取时只要计数器未变化就直接返回，
+    不访问数据库。超时时间由 MUSIC_RESPONSE_CACHE_TIMEOUT 控制，0 表示关闭。
+    缓存不可用时直接返回未缓存的响应。
+    """
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        timeout = settings.MUSIC_RESPONSE_CACHE_TIMEOUT
+        if not timeout or request.method != 'GET':
+            return method(self, request, *args, **kwargs)
+
+        key = response_cache_key(self, request)
+        try:
+            entry = cache.get(key)
+            if entry is not None and get_generations(list(entry['generations'])) == entry['generations']:
+                response = Response(entry['data'])
+                response['X-Cache'] = 'HIT'
+                return response
+
+            # 先读代数再查询，查询期间发生的写入会使本次结果在下次读取时失效
+            generations = get_generations(self.get_cache_dependencies(request))
+        except redis.RedisError as e:
+            logger.error(f'读取响应缓存失败，跳过缓存: {str(e)}')
+            return method(self, request, *args, **kwargs)
+
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            try:
+                cache.set(key, {'generations': generations, 'data': response.data}, timeout)
+            except redis.RedisError as e:
+                logger.error(f'写入响应缓存失败: {str(e)}')
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+class CachedResponseMixin:
+    """缓存 list / retrieve 响应，按平台代数失效
+
+    带 platform 参数的列表和单个对象的详情只依赖所属平台的代数，
+    其他响应依赖全局代数。
+    """
+
+    def get_cache_dependencies(self, request):
+        """返回响应依赖的代数计数器键"""
+        platform_id = request.query_params.get('platform')
+        if not platform_id and self.action == 'retrieve':
+            lookup = {self.lookup_field: self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)}
+            try:
+                platform_id = (
+                    self.get_queryset().model.objects.filter(**lookup)
+                    .values_list('platform', flat=True).first()
+                )
+            except (TypeError, ValueError):
+                platform_id = None
+        if platform_id:
+            return [platform_generation_key(platform_id)]
+        return [GLOBAL_GENERATION_KEY]
+
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,154 @@
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.db.models import Case, When, IntegerField
+from rest_framework import filters
+
+logger = logging.getLogger('django')
+
+# 中日韩文字连续片段，FTS5自带分词器无法切分，需要预先切成二字组(同MySQL ngram)
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+
+# 各列的bm25权重: 标题 > 艺术家 > 专辑 > 歌词
+COLUMN_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+
+def segment(text):
+    """索引用切分: 中日韩片段切为相邻二字组，并保留末字以支持单字搜索"""
+    def split_run(match):
+        run = match.group(0)
+        tokens = [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+        return f' {" ".join(tokens)} '
+    return CJK_RE.sub(split_run, text or '')
+
+
+def build_query(keyword):
+    """将用户输入转换为FTS5查询，各词之间为AND关系，支持前缀匹配"""
+    clauses = []
+    for term in keyword.split():
+        position = 0
+        for match in CJK_RE.finditer(term):
+            clauses.extend(_plain_clauses(term[position:match.start()]))
+            run = match.group(0)
+            if len(run) == 1:
+                clauses.append(f'"{run}"*')
+            else:
+                clauses.append('"' + ' '.join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+            position = match.end()
+        clauses.extend(_plain_clauses(term[position:]))
+    return ' AND '.join(clauses)
+
+
+def _plain_clauses(text):
+    words = re.findall(r'\w+', text)
+    return [f'"{word}"*' for word in words]
+
+
+class SongSearchIndex:
+    """歌曲全文索引(SQLite FTS5影子索引)
+
+    以歌曲主键为rowid，索引标题、艺术家名、专辑标题和歌词，
+    爬虫保存歌曲后增量更新，检索结果按bm25相关度排序。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS song_fts '
+                'USING fts5(title, artist, album, lyrics)'
+            )
+
+    def index(self, rows):
+        """写入或更新索引，rows 为 [(主键, 标题, 艺术家名, 专辑标题, 歌词)]"""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM song_fts WHERE rowid = ?', [(row[0],) for row in rows])
+            self._conn.executemany(
+                'INSERT INTO song_fts (rowid, title, artist, album, lyrics) VALUES (?, ?, ?, ?, ?)',
+                [(pk,) + tuple(segment(value) for value in values) for pk, *values in rows]
+            )
+
+    def remove(self, pks):
+        """从索引中删除"""
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM song_fts WHERE rowid = ?', [(pk,) for pk in pks])
+
+    def clear(self):
+        """清空索引"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM song_fts')
+
+    def search(self, keyword, limit):
+        """检索，返回按相关度排序的歌曲主键列表"""
+        query = build_query(keyword)
+        if not query:
+            return []
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT rowid FROM song_fts WHERE song_fts MATCH ? '
+                f'ORDER BY bm25(song_fts, {weights}) LIMIT ?',
+                (query, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+_song_index = None
+_song_index_lock = threading.Lock()
+
+
+def get_song_index():
+    """获取进程内共用的歌曲全文索引"""
+    global _song_index
+    with _song_index_lock:
+        if _song_index is None:
+            _song_index = SongSearchIndex(settings.MUSIC_SEARCH_INDEX_PATH)
+        return _song_index
+
+
+def index_songs(queryset):
+    """按查询集增量更新歌曲索引"""
+    rows = queryset.values_list('pk', 'title', 'artist__name', 'album__title', 'lyrics')
+    try:
+        get_song_index().index(
+            (pk, title, artist or '', album or '', lyrics) for pk, title, artist, album, lyrics in rows
+        )
+    except sqlite3.Error as e:
+        # 索引失败不影响数据保存，可通过 rebuild_search_index 重建
+        logger.error(f'更新歌曲全文索引失败: {str(e)}')
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """基于全文索引的搜索过滤器
+
+    有搜索词时从索引取相关度最高的 MUSIC_SEARCH_MAX_RESULTS 首歌曲，
+    未指定 ordering 参数时按相关度排序。
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        keyword = request.query_params.get(self.search_param, '').strip()
+        if not keyword:
+            return queryset
+
+        try:
+            pks = get_song_index().search(keyword, settings.MUSIC_SEARCH_MAX_RESULTS)
+        except sqlite3.Error as e:
+            logger.error(f'全文检索失败，改用模糊匹配: {str(e)}')
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = queryset.filter(pk__in=pks)
+        if pks and not request.query_params.get('ordering'):
+            rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(pks)],
+                        output_field=IntegerField())
+            # 以注解形式排序，分页器据此按相关度做键集分页
+            queryset = queryset.annotate(search_rank=rank).order_by('search_rank')
+        return queryset
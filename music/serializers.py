@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import Song, Artist, Album, Platform
+from .counters import pending_plays
+from .fieldsets import SparseFieldsetSerializerMixin
 
 
 class PlatformSerializer(serializers.ModelSerializer):
@@ -8,7 +10,7 @@ class PlatformSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ArtistSerializer(serializers.ModelSerializer):
+class ArtistSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     platform_name = serializers.CharField(source='platform.name', read_only=True)
     
     class Meta:
@@ -18,7 +20,7 @@ class ArtistSerializer(serializers.ModelSerializer):
                  'created_at', 'updated_at']
 
 
-class AlbumSerializer(serializers.ModelSerializer):
+class AlbumSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     artist_name = serializers.CharField(source='artist.name', read_only=True)
     platform_name = serializers.CharField(source='platform.name', read_only=True)
     
@@ -30,7 +32,16 @@ class AlbumSerializer(serializers.ModelSerializer):
                  'created_at', 'updated_at']
 
 
-class SongSerializer(serializers.ModelSerializer):
+class SongListSerializer(serializers.ListSerializer):
+    """歌曲列表序列化器，一次查出整页歌曲尚未写库的播放增量"""
+    
+    def to_representation(self, data):
+        songs = list(data.all() if hasattr(data, 'all') else data)
+        self.context['pending_plays'] = pending_plays([song.pk for song in songs])
+        return super().to_representation(songs)
+
+
+class SongSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     artist_name = serializers.CharField(source='artist.name', read_only=True)
     album_title = serializers.CharField(source='album.title', read_only=True)
     platform_name = serializers.CharField(source='platform.name', read_only=True)
@@ -42,4 +53,17 @@ class SongSerializer(serializers.ModelSerializer):
                  'album_title', 'duration', 'duration_display', 'lyrics', 
                  'genre', 'platform', 'platform_name', 'platform_id', 
                  'platform_url', 'audio_url', 'audio_file', 'play_count', 
-                 'like_count', 'created_at', 'updated_at']
\ No newline at end of file
+                 'like_count', 'work', 'created_at', 'updated_at']
+        list_serializer_class = SongListSerializer
+        # 非模型字段依赖的列，稀疏字段集据此决定查询哪些列
+        field_dependencies = {'duration_display': ['duration']}
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'play_count' in data:
+            # 播放次数包含计数器中尚未写库的增量
+            pending = self.context.get('pending_plays')
+            if pending is None:
+                pending = pending_plays([instance.pk])
+            data['play_count'] += pending.get(instance.pk, 0)
+        return data
\ No newline at end of file
@@ -0,0 +1,119 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Song, Artist, Album, Platform
+from .search import index_songs, get_song_index
+from .leaderboard import board_names, record_songs, remove_from_boards
+from .responsecache import invalidate_platforms
+from .dedup import safe_assign_works
+
+# 影响全文索引内容的字段
+INDEXED_FIELDS = {'title', 'artist', 'album', 'lyrics'}
+# 影响热门榜单的字段
+RANKED_FIELDS = {'play_count', 'genre', 'platform'}
+# 影响去重指纹的字段
+DEDUP_FIELDS = {'title', 'artist', 'duration'}
+
+
+@receiver(post_save, sender=Song)
+def update_song_index(sender, instance, **kwargs):
+    """歌曲保存后更新全文索引"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not INDEXED_FIELDS & set(update_fields):
+        return
+    index_songs(Song.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Song)
+def remove_song_index(sender, instance, **kwargs):
+    """歌曲删除后移出全文索引"""
+    get_song_index().remove([instance.pk])
+
+
+@receiver(post_save, sender=Artist)
+def reindex_artist_songs(sender, instance, created, **kwargs):
+    """艺术家改名后重建其歌曲的全文索引"""
+    update_fields = kwargs.get('update_fields')
+    if created or (update_fields and 'name' not in update_fields):
+        return
+    index_songs(Song.objects.filter(artist=instance))
+
+
+@receiver(post_save, sender=Album)
+def reindex_album_songs(sender, instance, created, **kwargs):
+    """专辑改名后重建其歌曲的全文索引"""
+    update_fields = kwargs.get('update_fields')
+    if created or (update_fields and 'title' not in update_fields):
+        return
+    index_songs(Song.objects.filter(album=instance))
+
+
+def song_boards(pk):
+    """按数据库中的平台和类型返回歌曲所在的榜单"""
+    row = Song.objects.filter(pk=pk).values_list('platform', 'genre').first()
+    return set(board_names(*row)) if row else set()
+
+
+@receiver(pre_save, sender=Song)
+def remember_song_boards(sender, instance, **kwargs):
+    """记录保存前歌曲所在的榜单，平台或类型变化后从原榜单移除"""
+    update_fields = kwargs.get('update_fields')
+    if instance.pk is None or (update_fields and not {'genre', 'platform'} & set(update_fields)):
+        instance._previous_boards = None
+        return
+    instance._previous_boards = song_boards(instance.pk)
+
+
+@receiver(post_save, sender=Song)
+def update_leaderboard(sender, instance, **kwargs):
+    """歌曲保存后更新热门榜单"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not RANKED_FIELDS & set(update_fields):
+        return
+    previous = getattr(instance, '_previous_boards', None)
+    if previous:
+        stale = previous - song_boards(instance.pk)
+        if stale:
+            remove_from_boards(instance.pk, stale)
+    record_songs(Song.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Song)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    """歌曲删除后移出热门榜单"""
+    try:
+        platform_id = instance.platform.pk
+    except ObjectDoesNotExist:
+        platform_id = None
+    boards = set(board_names(platform_id, instance.genre))
+    if platform_id is None:
+        boards.discard('platform:None')
+    remove_from_boards(instance.pk, boards)
+
+
+@receiver(post_save, sender=Song)
+def update_work(sender, instance, **kwargs):
+    """歌曲保存后归并到作品"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not DEDUP_FIELDS & set(update_fields):
+        return
+    safe_assign_works([instance.pk])
+
+
+@receiver(post_save, sender=Platform)
+@receiver(post_delete, sender=Platform)
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+@receiver(post_save, sender=Album)
+@receiver(post_delete, sender=Album)
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+def invalidate_response_cache(sender, instance, **kwargs):
+    """曲库数据变化后使所属平台的接口缓存失效"""
+    try:
+        platform = instance if sender is Platform else instance.platform
+    except ObjectDoesNotExist:
+        # 级联删除时平台可能已不存在，只使全局缓存失效
+        invalidate_platforms([])
+        return
+    invalidate_platforms([platform.pk])
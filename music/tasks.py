@@ -0,0 +1,8 @@
+from celery import shared_task
+from .counters import flush_play_counts as flush_pending_play_counts
+
+
+@shared_task
+def flush_play_counts():
+    """定时将累计的播放次数写入数据库"""
+    return flush_pending_play_counts()
@@ -0,0 +1,60 @@
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from music.models import Platform, Artist, Album, Song
+from music.management.commands.check_query_plans import PLAN_CASES, build_queryset, explain
+from crawler.models import CrawlTask, CrawlLog
+
+
+class QueryPlanTests(TestCase):
+    """列表接口生成的查询应由索引提供过滤和顺序，不出现全表扫描或文件排序"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        platforms = [
+            Platform.objects.create(name=f'平台{i}', base_url=f'https://music{i}.example.com')
+            for i in range(3)
+        ]
+        artists = Artist.objects.bulk_create([
+            Artist(name=f'艺术家{i}', platform=platforms[i % 3], platform_id=str(i),
+                   created_at=now - timedelta(minutes=i))
+            for i in range(100)
+        ])
+        albums = Album.objects.bulk_create([
+            Album(title=f'专辑{i}', artist=artists[i % 100], platform=platforms[i % 3],
+                  platform_id=str(i), release_date=(now - timedelta(days=i)).date(),
+                  created_at=now - timedelta(minutes=i))
+            for i in range(200)
+        ])
+        Song.objects.bulk_create([
+            Song(title=f'歌曲{i}', artist=artists[i % 100], album=albums[i % 200],
+                 platform=platforms[i % 3], platform_id=str(i), duration=120 + i % 300,
+                 genre=['pop', 'rock', 'jazz', ''][i % 4], play_count=i * 7 % 1000,
+                 like_count=i * 3 % 500, created_at=now - timedelta(minutes=i))
+            for i in range(1000)
+        ])
+        tasks = [
+            CrawlTask.objects.create(name=f'任务{i}', platform=platforms[i % 3], task_type='search',
+                                     target_url='https://music.example.com/search')
+            for i in range(5)
+        ]
+        CrawlLog.objects.bulk_create([
+            CrawlLog(task=tasks[i % 5], level=['INFO', 'WARNING', 'ERROR'][i % 3],
+                     message=f'日志{i}', created_at=now - timedelta(seconds=i))
+            for i in range(1000)
+        ])
+        if connection.vendor == 'mysql':
+            # 让优化器按种子数据的统计信息选择执行计划
+            with connection.cursor() as cursor:
+                for model in (Artist, Album, Song, CrawlLog):
+                    cursor.execute(f'ANALYZE TABLE {connection.ops.quote_name(model._meta.db_table)}')
+
+    def test_list_queries_use_indexes(self):
+        for description, viewset, params in PLAN_CASES:
+            with self.subTest(description):
+                queryset = build_queryset(viewset, params)
+                self.assertIsNotNone(queryset)
+                plan, problems = explain(queryset)
+                self.assertEqual(problems, [], f'{description}:\n{plan}')
@@ -1,9 +1,77 @@
+import logging
+import redis
+from django.conf import settings
+from django.db.models import Q, Min
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Song, Artist, Album, Platform
 from .serializers import SongSerializer, ArtistSerializer, AlbumSerializer, PlatformSerializer
+from .search import FullTextSearchFilter
+from .pagination import KeysetPagination
+from .fieldsets import SparseFieldsetMixin
+from .responsecache import CachedResponseMixin, cache_response
+from .leaderboard import get_leaderboard, record_songs, record_play_counts
+from .counters import record_play
+from .export import EXPORT_FORMATS, CONTENT_TYPES, export_stream
+
+logger = logging.getLogger('django')
+
+
+class ExportMixin:
+    """流式导出接口，子类指定 export_type"""
+    export_type = None
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """流式导出 NDJSON/CSV
+        
+        参数: output=ndjson|csv, compress=gzip, platform=平台ID,
+        updated_after=上次导出返回的水位线(ISO时间)。
+        响应头 X-Export-Watermark 为本次导出的水位线，用于下次增量导出。
+        """
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'output': f'仅支持: {", ".join(EXPORT_FORMATS)}'})
+        compress = request.query_params.get('compress') == 'gzip'
+        
+        since = request.query_params.get('updated_after')
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                # 格式正确但日期不存在(如2月30日)
+                since = None
+            if since is None:
+                raise ValidationError({'updated_after': '时间格式无效'})
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        
+        platform = request.query_params.get('platform') or None
+        if platform is not None:
+            try:
+                platform = int(platform)
+            except ValueError:
+                raise ValidationError({'platform': '平台ID必须是整数'})
+        
+        # 导出开始时间作为上界，期间更新的数据留给下次增量导出
+        until = timezone.now()
+        stream = export_stream(
+            self.export_type, export_format, compress,
+            platform=platform,
+            since=since or None, until=until,
+        )
+        
+        filename = f'{self.export_type}.{export_format}' + ('.gz' if compress else '')
+        response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Export-Watermark'] = until.isoformat()
+        return response
 
 
 class PlatformViewSet(viewsets.ModelViewSet):
@@ -15,10 +83,12 @@ class PlatformViewSet(viewsets.ModelViewSet):
     search_fields = ['name']
 
 
-class ArtistViewSet(viewsets.ModelViewSet):
+class ArtistViewSet(CachedResponseMixin, SparseFieldsetMixin, ExportMixin, viewsets.ModelViewSet):
     """艺术家视图集"""
+    export_type = 'artists'
     queryset = Artist.objects.select_related('platform').all()
     serializer_class = ArtistSerializer
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['platform']
     search_fields = ['name']
@@ -26,10 +96,12 @@ class ArtistViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
 
-class AlbumViewSet(viewsets.ModelViewSet):
+class AlbumViewSet(CachedResponseMixin, SparseFieldsetMixin, ExportMixin, viewsets.ModelViewSet):
     """专辑视图集"""
+    export_type = 'albums'
     queryset = Album.objects.select_related('artist', 'platform').all()
     serializer_class = AlbumSerializer
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['platform', 'artist']
     search_fields = ['title', 'artist__name']
@@ -37,27 +109,102 @@ class AlbumViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
 
-class SongViewSet(viewsets.ModelViewSet):
+class SongViewSet(CachedResponseMixin, SparseFieldsetMixin, ExportMixin, viewsets.ModelViewSet):
     """歌曲视图集"""
+    export_type = 'songs'
     queryset = Song.objects.select_related('artist', 'album', 'platform').all()
     serializer_class = SongSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['platform', 'artist', 'album', 'genre']
+    pagination_class = KeysetPagination
+    # 全文检索放在排序之后，未指定 ordering 时按相关度排序
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
+    filterset_fields = ['platform', 'artist', 'album', 'genre', 'work']
     search_fields = ['title', 'artist__name', 'album__title', 'lyrics']
     ordering_fields = ['title', 'duration', 'play_count', 'like_count', 'created_at']
     ordering = ['-created_at']
+    # 歌词较大，列表类接口默认不返回，需要时用 ?fields= 指定
+    sparse_actions = ('list', 'retrieve', 'popular')
+    list_actions = ('list', 'popular')
+    list_exclude = ['lyrics']
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            queryset = self.collapse_works(queryset)
+        return queryset
+    
+    def collapse_works(self, queryset):
+        """?collapse=work 时每个作品只返回一首歌曲
+        
+        在过滤后的结果内归并: 取每个作品中满足过滤条件的主键最小的歌曲，
+        其他平台的同一作品不影响本次结果；尚未归并的歌曲照常返回。
+        """
+        if self.request.query_params.get('collapse') != 'work':
+            return queryset
+        representatives = (
+            queryset.order_by().filter(work__isnull=False)
+            .values('work').annotate(first=Min('pk')).values('first')
+        )
+        return queryset.filter(Q(work__isnull=True) | Q(pk__in=representatives))
     
     @action(detail=False, methods=['get'])
+    @cache_response
     def popular(self, request):
-        """获取热门歌曲"""
-        popular_songs = self.queryset.order_by('-play_count')[:20]
+        """获取热门歌曲，可按 platform 或 genre 查看分榜"""
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 20
+        limit = max(1, min(limit, settings.MUSIC_LEADERBOARD_SIZE))
+        platform = request.query_params.get('platform')
+        genre = request.query_params.get('genre')
+        queryset = self.get_queryset()
+        if platform:
+            try:
+                platform = int(platform)
+            except ValueError:
+                raise ValidationError({'platform': '平台ID必须是整数'})
+            board = f'platform:{platform}'
+            queryset = queryset.filter(platform=platform)
+        elif genre:
+            board = f'genre:{genre}'
+            queryset = queryset.filter(genre=genre)
+        else:
+            board = 'all'
+        
+        try:
+            pks = get_leaderboard().top(board, limit)
+            leaderboard_ok = True
+        except redis.RedisError as e:
+            logger.error(f'读取热门榜单失败，改为查询数据库: {str(e)}')
+            pks = []
+            leaderboard_ok = False
+        if pks:
+            # 按榜单条件再过滤一次，丢弃批量修改后残留的过期条目
+            songs = {song.pk: song for song in self.collapse_works(queryset.filter(pk__in=pks))}
+            popular_songs = [songs[pk] for pk in pks if pk in songs]
+        else:
+            # 榜单为空(如缓存刚清空)或不可用时查询数据库，可用时回填
+            popular_songs = list(queryset.order_by('-play_count')[:settings.MUSIC_LEADERBOARD_SIZE])
+            if leaderboard_ok:
+                record_songs(Song.objects.filter(pk__in=[song.pk for song in popular_songs]))
+            if self.request.query_params.get('collapse') == 'work':
+                # 与榜单一样只在上榜歌曲内归并
+                kept = set(self.collapse_works(
+                    Song.objects.filter(pk__in=[song.pk for song in popular_songs])
+                ).values_list('pk', flat=True))
+                popular_songs = [song for song in popular_songs if song.pk in kept]
+            popular_songs = popular_songs[:limit]
+        
         serializer = self.get_serializer(popular_songs, many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def play(self, request, pk=None):
-        """播放歌曲（增加播放次数）"""
+        """播放歌曲（增加播放次数）
+        
+        播放次数先累加到计数器，由定时任务批量写库，返回值包含尚未写库的增量。
+        """
         song = self.get_object()
-        song.play_count += 1
-        song.save()
-        return Response({'message': '播放次数已更新', 'play_count': song.play_count})
\ No newline at end of file
+        play_count = song.play_count + record_play(song.pk)
+        record_play_counts([(song.pk, song.platform.pk, song.genre, play_count)])
+        return Response({'message': '播放次数已更新', 'play_count': play_count})
\ No newline at end of file
@@ -63,6 +63,7 @@ def main():
     print("1. 复制 .env.example 为 .env 并配置数据库连接")
     print("2. 启动Redis服务 (用于Celery)")
     print("3. 启动Celery Worker: celery -A melody_hunter worker -l info")
+    print("   歌词补全Worker: celery -A melody_hunter worker -Q lyrics -l info")
     print("4. 启动开发服务器: python manage.py runserver")
     print("5. 访问管理后台: http://127.0.0.1:8000/admin/")
     print("6. API文档: http://127.0.0.1:8000/api/")